@@ -104,6 +104,19 @@ def get_payload(req):
             "values": list(queryset.values("status", "id", "device")),
         }
 
+    elif action == "status_batch":
+        identifiers_str = req.get("identifiers")
+        assert identifiers_str is not None, "identifiers must be specified for " + action
+        identifiers = [i for i in identifiers_str.split(",") if i != ""]
+        queryset = BenchmarkInfo.objects.filter(
+            identifier__in=identifiers, job_queue=job_queue
+        )
+
+        return {
+            "status": "success",
+            "values": list(queryset.values("status", "id", "device", "identifier")),
+        }
+
     elif action == "get":
         queryset = BenchmarkInfo.objects.filter(id__in=ids, job_queue=job_queue)
 
@@ -1,6 +1,7 @@
+import gzip
 import json
 
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, QueryDict
 from django.template.loader import render_to_string
 from django.views.decorators.csrf import csrf_exempt
 from django_tables2 import RequestConfig
@@ -45,9 +46,19 @@ PLOTABLE_COL_SET = {
 COL_PER_ROW = 1
 
 
+def _get_body(request):
+    # lab hosts may gzip large request bodies
+    if request.META.get("HTTP_CONTENT_ENCODING") == "gzip":
+        return gzip.decompress(request.body)
+    return request.body
+
+
 @csrf_exempt
 def handle_request(request):
-    data = request.POST.copy()
+    if request.META.get("HTTP_CONTENT_ENCODING") == "gzip":
+        data = QueryDict(_get_body(request), mutable=True)
+    else:
+        data = request.POST.copy()
     results = get_payload(data)
 
     return JsonResponse(results)
@@ -55,7 +66,7 @@ def handle_request(request):
 
 @csrf_exempt
 def store_benchmark_result(request):
-    data = json.loads(request.body)
+    data = json.loads(_get_body(request))
     results = store_result(data)
 
     return JsonResponse(results)
@@ -20,6 +20,7 @@ import tempfile
 
 import requests
 from utils.custom_logger import getLogger
+from utils.tracing import traced
 from utils.utilities import deepMerge, deepReplace
 
 
@@ -34,6 +35,7 @@ class BenchmarkCollector:
         self.model_cache = model_cache
         self.framework = framework
 
+    @traced("BenchmarkCollector.collectBenchmarks")
     def collectBenchmarks(self, info, source, user_identifier):
         assert os.path.isfile(source), f"Source {source} is not a file"
         with open(source) as f:
@@ -217,6 +219,7 @@ class BenchmarkCollector:
                 file_hashes.append(file_hash)
         return hashlib.md5("".join(file_hashes).encode("utf-8")).hexdigest()
 
+    @traced("validate_md5")
     def _calculateMD5(self, model_name: str, old_md5: str, filename: str) -> str:
         if os.stat(filename).st_size >= COPY_THRESHOLD or os.path.islink(model_name):
             if not os.path.isfile(model_name):
@@ -233,6 +236,7 @@ class BenchmarkCollector:
                 f"`{model_name}` needs to be a path to a existing file or directory"
             )
 
+    @traced("download_model")
     def _copyFile(self, field, destination_name, source):
         if "location" not in field:
             return False
@@ -12,8 +12,10 @@
 
 
 import json
+import time
 
 from bridge.auth import Auth
+from metrics.exporter import getMetricsRegistry
 from utils.custom_logger import getLogger
 from utils.utilities import asyncRequestsJson, requestsJson
 
@@ -111,6 +113,20 @@ class DBDriver:
         request_json = self._requestData(params)
         return request_json["values"]
 
+    def statusBenchmarksBatch(self, identifiers):
+        """Query the status of the jobs of several identifiers in one request.
+        Returns None if the server does not support the batched action."""
+        params = {
+            "table": self.table,
+            "job_queue": self.job_queue,
+            "action": "status_batch",
+            "identifiers": ",".join(str(i) for i in identifiers),
+        }
+        request_json = self._requestData(params, retry=False)
+        if request_json["status"] != "success":
+            return None
+        return request_json["values"]
+
     def updateLogBenchmarks(self, id, log):
         params = {
             "table": self.table,
@@ -164,9 +180,17 @@ class DBDriver:
 
     def _requestData(self, params, retry=True):
         params.update(self.auth_params)
-        result_json = requestsJson(
-            self.benchmark_db_entry, data=params, timeout=NETWORK_TIMEOUT, retry=retry
-        )
+        start = time.monotonic()
+        result_json = {}
+        try:
+            result_json = requestsJson(
+                self.benchmark_db_entry,
+                data=params,
+                timeout=NETWORK_TIMEOUT,
+                retry=retry,
+            )
+        finally:
+            self._recordRequest(params, start, result_json)
         if "status" not in result_json or result_json["status"] != "success":
             getLogger().warning(
                 "DB post failed.\tbenchmark_db_entry: {}\t params: {}".format(
@@ -185,13 +209,18 @@ class DBDriver:
     async def _asyncRequestData(self, loop, params, retry=False):
         """Async request data function.  May need to wrap this in a task that can be cancelled if retry=True"""
         params.update(self.auth_params)
-        result_json = await asyncRequestsJson(
-            loop,
-            self.benchmark_db_entry,
-            data=params,
-            timeout=NETWORK_TIMEOUT,
-            retry=retry,
-        )
+        start = time.monotonic()
+        result_json = {}
+        try:
+            result_json = await asyncRequestsJson(
+                loop,
+                self.benchmark_db_entry,
+                data=params,
+                timeout=NETWORK_TIMEOUT,
+                retry=retry,
+            )
+        finally:
+            self._recordRequest(params, start, result_json)
         if "status" not in result_json or result_json["status"] != "success":
             getLogger().warning(
                 "DB post failed.\tbenchmark_db_entry: {}\t params: {}".format(
@@ -207,6 +236,22 @@ class DBDriver:
         else:
             return result_json
 
+    def _recordRequest(self, params, start, result_json):
+        registry = getMetricsRegistry()
+        action = params.get("action", "")
+        registry.observe(
+            "aibench_db_request_seconds",
+            "Latency of the requests to the job queue server.",
+            time.monotonic() - start,
+            action=action,
+        )
+        if result_json.get("status") != "success":
+            registry.incCounter(
+                "aibench_db_request_failures_total",
+                "Failed requests to the job queue server.",
+                action=action,
+            )
+
     def _processBenchmarkResults(self, result_json):
         for result in result_json:
             benchmarks = json.loads(result["benchmarks"])
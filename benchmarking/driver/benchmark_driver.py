@@ -17,10 +17,13 @@ import os
 import sys
 import time
 
+from platforms.device_readiness import coolDownPlatform
 from utils.custom_logger import getLogger
+from utils.tracing import summarizeTrace, traced, traceSpan
 from utils.utilities import deepMerge, getCommand, getRunStatus, setRunStatus
 
 
+@traced("runOneBenchmark")
 def runOneBenchmark(
     info,
     benchmark,
@@ -32,11 +35,14 @@ def runOneBenchmark(
     cooldown=None,
     user_identifier=None,
     local_reporter=None,
+    cooldown_args=None,
 ):
     assert "treatment" in info, "Treatment is missing in info"
     getLogger().info("Running {}".format(benchmark["path"]))
 
     status = 0
+    start = time.time()
+    cooldown_record = None
     minfo = copy.deepcopy(info["treatment"])
     mbenchmark = copy.deepcopy(benchmark)
     if "shared_libs" in info:
@@ -47,7 +53,8 @@ def runOneBenchmark(
         gc.collect()
         minfo["aibench_env"] = {}
         minfo["aibench_env"]["AIBENCH_TREATMENT_GROUP"] = "1"
-        data = _runOnePass(minfo, mbenchmark, framework, platform)
+        with traceSpan("treatment"):
+            data = _runOnePass(minfo, mbenchmark, framework, platform)
         status = status | getRunStatus()
         meta = None
         if "control" in info:
@@ -57,13 +64,15 @@ def runOneBenchmark(
             # cool down between treatment and control
             if "model" in benchmark and "cooldown" in benchmark["model"]:
                 cooldown = float(benchmark["model"]["cooldown"])
-            time.sleep(cooldown)
+            with traceSpan("cooldown"):
+                cooldown_record = coolDownPlatform(platform, cooldown, cooldown_args)
             # invalidate CPU cache
             [1.0 for _ in range(20 << 20)]
             gc.collect()
             cinfo["aibench_env"] = {}
             cinfo["aibench_env"]["AIBENCH_TREATMENT_GROUP"] = "0"
-            control = _runOnePass(cinfo, benchmark, framework, platform)
+            with traceSpan("control"):
+                control = _runOnePass(cinfo, benchmark, framework, platform)
             status = status | getRunStatus()
             bname = benchmark["model"]["name"]
             data = _mergeDelayData(data, control, bname)
@@ -72,6 +81,11 @@ def runOneBenchmark(
         meta = _retrieveMeta(
             info, benchmark, platform, framework, backend, user_identifier
         )
+        if cooldown_record:
+            meta.update(cooldown_record)
+        phase_times = summarizeTrace(start)
+        if phase_times:
+            meta["phase_times"] = phase_times
         data = _retrieveInfo(info, data)
         result = {"meta": meta, "data": data}
     except Exception:
@@ -93,7 +107,7 @@ def runOneBenchmark(
         _logNoData(benchmark, info, platform.getMangledName())
         return status
 
-    with lock:
+    with traceSpan("reporting"), lock:
         for reporter in reporters:
             reporter.report(result)
 
@@ -104,15 +118,16 @@ def runOneBenchmark(
     ):
         from regression_detectors.regression_detectors import checkRegressions
 
-        checkRegressions(
-            info,
-            platform,
-            framework,
-            benchmark,
-            reporters,
-            result["meta"],
-            local_reporter,
-        )
+        with traceSpan("regression_check"):
+            checkRegressions(
+                info,
+                platform,
+                framework,
+                benchmark,
+                reporters,
+                result["meta"],
+                local_reporter,
+            )
     return status
 
 
@@ -147,8 +162,9 @@ def _runOnePass(info, benchmark, framework, platform):
         if getRunStatus() != 0:
             # early exit if there is an error
             break
-    stats = _getStatisticsSet(benchmark["tests"][0])
-    data = _processDelayData(output, stats)
+    with traceSpan("statistics"):
+        stats = _getStatisticsSet(benchmark["tests"][0])
+        data = _processDelayData(output, stats)
     return data
 
 
@@ -461,6 +477,10 @@ def _retrieveMeta(info, benchmark, platform, framework, backend, user_identifier
     if "user" in info:
         meta["user"] = info["user"]
 
+    # cooldown of the device before this run, e.g. by the lab
+    for k, v in info.get("device_cooldown", {}).items():
+        meta["device_" + k] = v
+
     return meta
 
 
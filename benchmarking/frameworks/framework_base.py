@@ -32,6 +32,7 @@ from platforms.platforms import getHostPlatform
 from profilers.perfetto.perfetto import PerfettoAnySupported
 from utils import software_power
 from utils.custom_logger import getLogger
+from utils.tracing import traced, traceSpan
 from utils.utilities import (
     deepMerge,
     deepReplace,
@@ -53,6 +54,7 @@ class FrameworkBase:
         return "Error"
 
     @abc.abstractmethod
+    @traced("FrameworkBase.runBenchmark")
     def runBenchmark(self, info, benchmark, platform):
         model = benchmark["model"]
         tests = benchmark["tests"]
@@ -87,17 +89,19 @@ class FrameworkBase:
 
         # Extract use_enkaku flag from benchmark if present
         use_enkaku = benchmark.get("use_enkaku", True)
-        platform.preprocess(
-            use_enkaku=use_enkaku, programs=program_files, benchmark=benchmark
-        )
+        with traceSpan("platform_preprocess"):
+            platform.preprocess(
+                use_enkaku=use_enkaku, programs=program_files, benchmark=benchmark
+            )
 
         tgt_program_files, host_program_files = self._separatePrograms(
             program_files, test.get("commands")
         )
 
-        tgt_program_files = platform.copyFilesToPlatform(
-            tgt_program_files, copy_files=first_iteration
-        )
+        with traceSpan("push"):
+            tgt_program_files = platform.copyFilesToPlatform(
+                tgt_program_files, copy_files=first_iteration
+            )
         programs = {}
         deepMerge(programs, host_program_files)
         deepMerge(programs, tgt_program_files)
@@ -202,18 +206,19 @@ class FrameworkBase:
                     converter,
                 )
 
-        tgt_input_files = (
-            platform.copyFilesToPlatform(input_files) if input_files else None
-        )
-        shared_libs = None
-        if "shared_libs" in info:
-            shared_libs = platform.copyFilesToPlatform(
-                info["shared_libs"], copy_files=first_iteration
+        with traceSpan("push"):
+            tgt_input_files = (
+                platform.copyFilesToPlatform(input_files) if input_files else None
             )
+            shared_libs = None
+            if "shared_libs" in info:
+                shared_libs = platform.copyFilesToPlatform(
+                    info["shared_libs"], copy_files=first_iteration
+                )
 
-        tgt_model_files = platform.copyFilesToPlatform(
-            model_files, copy_files=first_iteration
-        )
+            tgt_model_files = platform.copyFilesToPlatform(
+                model_files, copy_files=first_iteration
+            )
 
         tgt_result_files = None
         if "output_files" in test:
@@ -244,7 +249,13 @@ class FrameworkBase:
 
             if method == "software":
                 power_util = software_power.PowerUtil(
-                    platform, test.get("collection_time", 300)
+                    platform,
+                    test.get("collection_time", 300),
+                    program=program,
+                    num_iters=test["iter"],
+                    sample_rate=test.get(
+                        "sample_rate", software_power.DEFAULT_SAMPLE_RATE
+                    ),
                 )
             else:
                 from utils.monsoon_power import collectPowerData
@@ -285,23 +296,25 @@ class FrameworkBase:
             if "aibench_env" in info:
                 platform_args["env"].update(info["aibench_env"])
 
-        self._runCommands(
-            output,
-            test["commands"],
-            platform,
-            programs,
-            model,
-            test,
-            tgt_model_files,
-            tgt_input_files,
-            tgt_result_files,
-            shared_libs,
-            test_files,
-            total_num,
-            converter,
-            platform_args=platform_args,
-            main_command=True,
-        )
+        # the binary run, collecting its output and converting the metrics
+        with traceSpan("run"):
+            self._runCommands(
+                output,
+                test["commands"],
+                platform,
+                programs,
+                model,
+                test,
+                tgt_model_files,
+                tgt_input_files,
+                tgt_result_files,
+                shared_libs,
+                test_files,
+                total_num,
+                converter,
+                platform_args=platform_args,
+                main_command=True,
+            )
 
         if test["metric"] == "power":
             if test.get("method") == "software":
@@ -323,6 +336,7 @@ class FrameworkBase:
                     test["iter"],
                     method=test["method"] if "method" in test else "monsoon",
                     monsoon_map=self.args.monsoon_map,
+                    output_format=monsoon_args.get("output_format", "npz"),
                 )
                 platform.waitForDevice(20)
                 # kill the process if exists
@@ -356,7 +370,10 @@ class FrameworkBase:
             target_dir = os.path.join(self.tempdir, "output")
             shutil.rmtree(target_dir, True)
             os.makedirs(target_dir)
-            output_files = platform.moveFilesFromPlatform(tgt_result_files, target_dir)
+            with traceSpan("pull"):
+                output_files = platform.moveFilesFromPlatform(
+                    tgt_result_files, target_dir
+                )
 
         if "postprocess" in test:
             if (
@@ -431,7 +448,10 @@ class FrameworkBase:
         if output_files:
             self._handle_output_files(output_files, test["output_files"], output)
 
-        platform.cleanup()
+        # programs and models are only copied on the first iteration
+        if last_iteration:
+            with traceSpan("cleanup"):
+                platform.cleanup()
 
         return output, output_files
 
@@ -24,9 +24,11 @@ import time
 from benchmarks.benchmarks import BenchmarkCollector
 from driver.benchmark_driver import runOneBenchmark
 from frameworks.frameworks import getFrameworks
+from platforms.device_readiness import coolDownPlatform, DEFAULT_COOLDOWN_MAX_WAIT
 from platforms.platforms import getPlatforms
 from reporters.reporters import getReporters
 from utils.custom_logger import getLogger
+from utils.tracing import getTracer, startTrace, stopTrace, traced, traceSpan
 from utils.utilities import (
     getRunKilled,
     getRunStatus,
@@ -62,6 +64,28 @@ parser.add_argument(
     type=float,
     help="Specify the time interval in seconds between two test runs.",
 )
+parser.add_argument(
+    "--adaptive_cooldown",
+    action="store_true",
+    help="Instead of sleeping for the cooldown time, wait until the device "
+    "temperatures and charge are stable within the bands given by "
+    "--cooldown_bands, up to --cooldown_max_wait seconds.",
+)
+parser.add_argument(
+    "--cooldown_bands",
+    help="A json string overriding the default adaptive cooldown bands.",
+)
+parser.add_argument(
+    "--cooldown_max_wait",
+    default=DEFAULT_COOLDOWN_MAX_WAIT,
+    type=float,
+    help="Maximum time in seconds the adaptive cooldown waits for a device.",
+)
+parser.add_argument(
+    "--device_cooldown",
+    help="A json string describing the cooldown of the device before this "
+    "run. It is recorded in the result meta.",
+)
 parser.add_argument(
     "--debug",
     action="store_true",
@@ -199,6 +223,11 @@ parser.add_argument(
     "The timeout value needs to be large enough so that the low end devices "
     "can safely finish the execution in normal conditions. ",
 )
+parser.add_argument(
+    "--trace_file",
+    help="Save the timing spans of the harness phases to this file, in the "
+    "Chrome trace event format. Lab jobs always record and upload them.",
+)
 parser.add_argument(
     "--user_identifier",
     help="User can specify an identifier and that will be passed to the "
@@ -240,15 +269,19 @@ class BenchmarkDriver:
         self.status = 0
         raw_args = kwargs.get("raw_args", None)
         self.usb_controller = kwargs.get("usb_controller")
+        # set by the warm lab workers to reuse platform objects across jobs
+        self.platform_cache = kwargs.get("platform_cache")
         self.args, self.unknowns = parser.parse_known_args(raw_args)
         self._lock = threading.Lock()
 
         # Set use_enkaku via JK check if not already provided via args
         self._set_use_enkaku_if_needed()
 
+    @traced("BenchmarkDriver.runBenchmark")
     def runBenchmark(self, info, platform, benchmarks):
         if self.args.reboot:
-            platform.rebootDevice()
+            with traceSpan("reboot"):
+                platform.rebootDevice()
         for idx in range(len(benchmarks)):
             tempdir = tempfile.mkdtemp(
                 prefix="_".join(["aibench", str(self.args.user_identifier), ""])
@@ -299,6 +332,7 @@ class BenchmarkDriver:
                 self.args.cooldown,
                 self.args.user_identifier,
                 self.args.local_reporter,
+                cooldown_args=self.args,
             )
             self.status = self.status | status
             if idx != len(benchmarks) - 1:
@@ -306,7 +340,8 @@ class BenchmarkDriver:
                 cooldown = self.args.cooldown
                 if "model" in benchmark and "cooldown" in benchmark["model"]:
                     cooldown = float(benchmark["model"]["cooldown"])
-                time.sleep(cooldown)
+                with traceSpan("cooldown"):
+                    coolDownPlatform(platform, cooldown, self.args)
             if not self.args.debug:
                 shutil.rmtree(tempdir, True)
                 for test in benchmark["tests"]:
@@ -315,6 +350,18 @@ class BenchmarkDriver:
                             shutil.rmtree(f["location"], True)
 
     def run(self):
+        # run_lab starts the trace of the job, only trace standalone runs here
+        own_trace = self.args.trace_file is not None and getTracer() is None
+        if own_trace:
+            startTrace()
+        try:
+            return self._run()
+        finally:
+            if own_trace:
+                stopTrace().save(self.args.trace_file)
+                getLogger().info(f"Saved the trace to {self.args.trace_file}")
+
+    def _run(self):
         tempdir = tempfile.mkdtemp(
             prefix="_".join(["aibench", str(self.args.user_identifier), ""])
         )
@@ -331,7 +378,8 @@ class BenchmarkDriver:
         benchmarks = bcollector.collectBenchmarks(
             info, self.args.benchmark_file, self.args.user_identifier
         )
-        platforms = getPlatforms(self.args, tempdir, self.usb_controller)
+        with traceSpan("get_platforms"):
+            platforms = self._getPlatforms(tempdir)
         threads = []
         for platform in platforms:
             t = threading.Thread(
@@ -346,6 +394,9 @@ class BenchmarkDriver:
             shutil.rmtree(tempdir, True)
 
         status = self.status | getRunStatus()
+        if status != 0 and self.platform_cache is not None:
+            # the device may be in a bad state, probe it again next time
+            self.platform_cache.clear()
         if getRunKilled():
             status_str = "killed"
         elif getRunTimeout():
@@ -365,6 +416,29 @@ class BenchmarkDriver:
             return RUN_TIMEOUT
         return status
 
+    def _getPlatforms(self, tempdir):
+        if self.platform_cache is None or not self.args.device:
+            return getPlatforms(self.args, tempdir, self.usb_controller)
+        key = (
+            self.args.platform,
+            self.args.device,
+            self.args.platform_sig,
+            self.args.hash_platform_mapping,
+            self.args.device_name_mapping,
+        )
+        platforms = self.platform_cache.get(key)
+        if platforms:
+            getLogger().info("Reusing the cached platform of the device worker.")
+            for platform in platforms:
+                platform.resetForJob(tempdir, self.args)
+            return platforms
+        platforms = getPlatforms(self.args, tempdir, self.usb_controller)
+        # a worker serves one device, keep only its latest platform
+        self.platform_cache.clear()
+        if platforms:
+            self.platform_cache[key] = platforms
+        return platforms
+
     def _getInfo(self):
         info = json.loads(self.args.info)
         info["run_type"] = "benchmark"
@@ -383,6 +457,8 @@ class BenchmarkDriver:
             )
         if self.args.user_string:
             info["user"] = self.args.user_string
+        if self.args.device_cooldown:
+            info["device_cooldown"] = json.loads(self.args.device_cooldown)
 
         return info
 
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+# pyre-unsafe
+
+##############################################################################
+# Copyright 2017-present, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+##############################################################################
+
+
+import math
+import random
+import time
+
+from platforms.platform_base import PlatformBase
+from platforms.platform_util_base import PlatformUtilBase
+
+# Durations are in simulated seconds. The run time of a job is drawn from a
+# lognormal distribution with the given median and sigma.
+DEFAULT_PLATFORM_PROFILES = {
+    "android": {
+        "setup": 20.0,
+        "median": 90.0,
+        "sigma": 0.5,
+        "failure_rate": 0.02,
+        "cooldown": 5.0,
+    },
+    "ios": {
+        "setup": 45.0,
+        "median": 120.0,
+        "sigma": 0.6,
+        "failure_rate": 0.05,
+        "cooldown": 10.0,
+    },
+}
+
+
+class FakeUtil(PlatformUtilBase):
+    """Keeps the files pushed to a fake device in memory."""
+
+    def __init__(self, device=None, tempdir=None):
+        super().__init__(device, tempdir)
+        self.files = {}
+
+    def push(self, src, tgt):
+        self.files[tgt] = src
+
+    def pull(self, src, tgt):
+        return self.files.get(src)
+
+    def deleteFile(self, file, *args, **kwargs):
+        self.files.pop(file, None)
+
+
+class FakePlatform(PlatformBase):
+    """
+    A platform without a device behind it. runBenchmark sleeps for a run time
+    drawn from the profile, scaled by time_scale real seconds per simulated
+    second, and fails with the profile's failure rate.
+    """
+
+    platform_type = None
+
+    def __init__(
+        self, hash, kind, profile=None, time_scale=1.0, rng=None, tempdir="/tmp"
+    ):
+        super().__init__(tempdir, "/fake", FakeUtil(hash, tempdir), None, None)
+        self.profile = dict(DEFAULT_PLATFORM_PROFILES[self.platform_type])
+        if profile:
+            self.profile.update(profile)
+        self.time_scale = time_scale
+        self.rng = rng or random.Random()
+        self.type = self.platform_type
+        self.setPlatform(kind)
+        self.platform_model = kind
+
+    def getKind(self):
+        return self.platform
+
+    def getOS(self):
+        return f"fake {self.type}"
+
+    def getName(self):
+        return self.platform
+
+    def preprocess(self, *args, **kwargs):
+        self._sleep(self.profile["setup"])
+
+    def postprocess(self, *args, **kwargs):
+        pass
+
+    def sampleRunTime(self):
+        return self.rng.lognormvariate(
+            math.log(self.profile["median"]), self.profile["sigma"]
+        )
+
+    def runBenchmark(self, cmd=None, *args, **kwargs):
+        """Return (output, succeeded) after sleeping the sampled run time."""
+        self._sleep(self.sampleRunTime())
+        failed = self.rng.random() < self.profile["failure_rate"]
+        return {"cmd": cmd, "failed": failed}, not failed
+
+    def coolDown(self):
+        self._sleep(self.profile["cooldown"])
+
+    def _sleep(self, seconds):
+        time.sleep(seconds * self.time_scale)
+
+
+class FakeAndroidPlatform(FakePlatform):
+    platform_type = "android"
+
+
+class FakeIOSPlatform(FakePlatform):
+    platform_type = "ios"
+
+
+FAKE_PLATFORMS = {
+    "android": FakeAndroidPlatform,
+    "ios": FakeIOSPlatform,
+}
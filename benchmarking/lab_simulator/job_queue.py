@@ -0,0 +1,300 @@
+#!/usr/bin/env python
+
+# pyre-unsafe
+
+##############################################################################
+# Copyright 2017-present, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+##############################################################################
+
+
+import gzip
+import json
+import sqlite3
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+from bridge.db import DBDriver
+
+DEVICE_STATUS = {"0": "OCCUPIED", "1": "AVAILABLE"}
+
+
+class SQLiteJobQueue:
+    """
+    A SQLite stand-in for the benchmark/ endpoint of the ailab server. handle()
+    takes the same request parameters and returns the same payloads as
+    ailab/benchmark/db_controller.get_payload. Timestamps are epoch seconds
+    from the clock function.
+    """
+
+    def __init__(self, path=":memory:", clock=time.time):
+        self.clock = clock
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.lock = threading.Lock()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS benchmark_info ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, status TEXT NOT NULL, "
+                "identifier INTEGER, claimer TEXT, benchmarks TEXT, device TEXT, "
+                "hash TEXT, user TEXT, job_queue TEXT, log TEXT, result TEXT, "
+                "queue_time REAL, claimed_time REAL, start_time REAL, done_time REAL)"
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS benchmark_info_status "
+                "ON benchmark_info (status, device, job_queue)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS device ("
+                "hash TEXT PRIMARY KEY, device TEXT, status TEXT, claimer TEXT, "
+                "job_queue TEXT, update_time REAL, heartbeat_time REAL)"
+            )
+
+    def handle(self, req):
+        action = req.get("action")
+        assert action is not None, "action not provided"
+        handler = getattr(self, "_" + action, None)
+        assert handler is not None, f"action {action} not recognized"
+        with self.lock, self.conn:
+            return handler(req, _split(req.get("devices")), _split(req.get("ids")))
+
+    def getJobs(self):
+        with self.lock:
+            rows = self.conn.execute("SELECT * FROM benchmark_info ORDER BY id")
+            return [dict(row) for row in rows]
+
+    def _add(self, req, devices, ids):
+        now = self.clock()
+        hashes = _split(req.get("hashes"))
+        for idx, device in enumerate(devices):
+            self.conn.execute(
+                "INSERT INTO benchmark_info (status, identifier, benchmarks, device, "
+                "hash, user, job_queue, queue_time) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    "QUEUE",
+                    req.get("identifier"),
+                    req.get("benchmarks"),
+                    device,
+                    hashes[idx] if idx < len(hashes) else None,
+                    req.get("user"),
+                    req.get("job_queue"),
+                    now,
+                ),
+            )
+        return {"status": "success"}
+
+    def _claim(self, req, devices, ids):
+        now = self.clock()
+        claimer = req.get("claimer")
+        job_queue = req.get("job_queue")
+        for device in devices:
+            claimed = self.conn.execute(
+                "SELECT id FROM benchmark_info WHERE status = 'CLAIMED' AND "
+                "device = ? AND claimer = ? AND job_queue = ? LIMIT 1",
+                (device, claimer, job_queue),
+            ).fetchone()
+            if claimed:
+                continue
+            queued = self.conn.execute(
+                "SELECT id FROM benchmark_info WHERE status = 'QUEUE' AND "
+                "device = ? AND job_queue = ? ORDER BY id LIMIT 1",
+                (device, job_queue),
+            ).fetchone()
+            if queued:
+                self.conn.execute(
+                    "UPDATE benchmark_info SET status = 'CLAIMED', claimed_time = ?, "
+                    "claimer = ? WHERE id = ?",
+                    (now, claimer, queued["id"]),
+                )
+        self.conn.executemany(
+            "UPDATE device SET heartbeat_time = ? WHERE device = ?",
+            [(now, device) for device in set(devices)],
+        )
+        rows = self.conn.execute(
+            "SELECT * FROM benchmark_info WHERE status = 'CLAIMED' AND claimer = ?",
+            (claimer,),
+        )
+        return {"status": "success", "values": [dict(row) for row in rows]}
+
+    def _run(self, req, devices, ids):
+        self.conn.executemany(
+            "UPDATE benchmark_info SET status = 'RUNNING', start_time = ? "
+            "WHERE id = ? AND claimer = ? AND job_queue = ?",
+            [(self.clock(), id, req.get("claimer"), req.get("job_queue")) for id in ids],
+        )
+        return {"status": "success"}
+
+    def _release(self, req, devices, ids):
+        self.conn.executemany(
+            "UPDATE benchmark_info SET status = 'QUEUE', claimed_time = NULL, "
+            "start_time = NULL, claimer = NULL WHERE id = ? AND job_queue = ?",
+            [(id, req.get("job_queue")) for id in ids],
+        )
+        return {"status": "success"}
+
+    def _done(self, req, devices, ids):
+        status = req.get("status")
+        assert status in ("DONE", "FAILED", "USER_ERROR"), f"Unknown status {status}"
+        self.conn.execute(
+            "UPDATE benchmark_info SET status = ?, done_time = ?, result = ?, log = ? "
+            "WHERE id = ? AND job_queue = ?",
+            (
+                status,
+                self.clock(),
+                req.get("result"),
+                req.get("log"),
+                req.get("id"),
+                req.get("job_queue"),
+            ),
+        )
+        return {"status": "success"}
+
+    def _kill(self, req, devices, ids):
+        self.conn.execute(
+            "UPDATE benchmark_info SET status = 'KILLED' WHERE identifier = ? "
+            "AND job_queue = ? AND status IN ('QUEUE', 'CLAIMED', 'RUNNING')",
+            (req.get("identifier"), req.get("job_queue")),
+        )
+        return {"status": "success"}
+
+    def _update_log(self, req, devices, ids):
+        self.conn.execute(
+            "UPDATE benchmark_info SET log = ? WHERE id = ?",
+            (req.get("log"), req.get("id")),
+        )
+        return {"status": "success"}
+
+    def _status(self, req, devices, ids):
+        rows = self.conn.execute(
+            "SELECT status, id, device FROM benchmark_info "
+            "WHERE identifier = ? AND job_queue = ?",
+            (req.get("identifier"), req.get("job_queue")),
+        )
+        return {"status": "success", "values": [dict(row) for row in rows]}
+
+    def _status_batch(self, req, devices, ids):
+        identifiers = _split(req.get("identifiers"))
+        rows = self.conn.execute(
+            "SELECT status, id, device, identifier FROM benchmark_info "
+            "WHERE job_queue = ? AND identifier IN ({})".format(
+                ",".join("?" * len(identifiers))
+            ),
+            [req.get("job_queue")] + identifiers,
+        )
+        return {"status": "success", "values": [dict(row) for row in rows]}
+
+    def _get(self, req, devices, ids):
+        rows = self.conn.execute(
+            "SELECT * FROM benchmark_info WHERE job_queue = ? AND id IN ({})".format(
+                ",".join("?" * len(ids))
+            ),
+            [req.get("job_queue")] + ids,
+        )
+        return {"status": "success", "values": [dict(row) for row in rows]}
+
+    def _list_devices(self, req, devices, ids):
+        job_queue = req.get("job_queue")
+        if job_queue == "*":
+            rows = self.conn.execute("SELECT * FROM device WHERE status != 'DISABLED'")
+        else:
+            rows = self.conn.execute(
+                "SELECT * FROM device WHERE job_queue = ?", (job_queue,)
+            )
+        return {"status": "success", "values": [dict(row) for row in rows]}
+
+    def _update_devices(self, req, devices, ids):
+        now = self.clock()
+        claimer = req.get("claimer")
+        if req.get("reset") == "true":
+            self.conn.execute(
+                "UPDATE device SET status = 'DISABLED', update_time = ? "
+                "WHERE claimer = ?",
+                (now, claimer),
+            )
+        for device in devices:
+            # kind|hash|status, or kind|hash|name|abi|os|status from run_lab
+            d = device.split("|")
+            assert len(d) in (3, 6), "Must have three or six elements in the input"
+            self.conn.execute(
+                "INSERT OR REPLACE INTO device (hash, device, status, claimer, "
+                "job_queue, update_time, heartbeat_time) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (
+                    d[1],
+                    d[0],
+                    DEVICE_STATUS.get(d[-1], "OFFLINE"),
+                    claimer,
+                    req.get("job_queue"),
+                    now,
+                    now,
+                ),
+            )
+        return {"status": "success"}
+
+    def _heartbeat(self, req, devices, ids):
+        self.conn.executemany(
+            "UPDATE device SET heartbeat_time = ? WHERE hash = ?",
+            [(self.clock(), hash) for hash in _split(req.get("hashes"))],
+        )
+        return {"status": "success"}
+
+
+def _split(value):
+    if not value:
+        return []
+    return [item for item in str(value).split(",") if item != ""]
+
+
+class LocalDBDriver(DBDriver):
+    """A DBDriver that calls a SQLiteJobQueue in process instead of the server."""
+
+    def __init__(self, job_queue, table="benchmark_info", queue_name="simulator"):
+        self.table = table
+        self.job_queue = queue_name
+        self.auth_params = {}
+        self.benchmark_db_entry = "local"
+        self.queue = job_queue
+
+    def _requestData(self, params, retry=True):
+        try:
+            return self.queue.handle(dict(params))
+        except AssertionError as e:
+            return {"status": "fail", "values": [], "error": str(e)}
+
+    async def _asyncRequestData(self, loop, params, retry=False):
+        return self._requestData(params, retry)
+
+
+class _JobQueueHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        req = dict(parse_qsl(body.decode("utf-8"), keep_blank_values=True))
+        try:
+            payload = self.server.job_queue.handle(req)
+        except AssertionError as e:
+            payload = {"status": "fail", "error": str(e)}
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serveJobQueue(job_queue, host="127.0.0.1", port=0):
+    """Serve the job queue over HTTP so that an unmodified run_lab can use
+    http://<host>:<port>/benchmark/ as its benchmark_db_entry."""
+    server = ThreadingHTTPServer((host, port), _JobQueueHandler)
+    server.job_queue = job_queue
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
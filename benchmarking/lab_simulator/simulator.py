@@ -0,0 +1,316 @@
+#!/usr/bin/env python
+
+# pyre-unsafe
+
+##############################################################################
+# Copyright 2017-present, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+##############################################################################
+
+
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from lab_simulator.fake_platforms import FAKE_PLATFORMS
+from lab_simulator.job_queue import LocalDBDriver, SQLiteJobQueue
+from platforms.device_manager import getDevicesString
+from run_lab import parser as run_lab_parser, RunLab
+from utils.custom_logger import getLogger
+from utils.device_affinity import DeviceAffinity, getJobArtifacts
+
+TERMINAL_STATUSES = ("DONE", "FAILED", "USER_ERROR", "KILLED")
+# Simulated seconds between two claims of a lab host, run_lab sleeps 1s.
+CLAIM_INTERVAL = 1.0
+
+
+def parseDevices(devices_str):
+    """Parse "<kind>:<android|ios>:<count>,..." into a list of device specs."""
+    devices = []
+    for entry in devices_str.split(","):
+        kind, platform_type, count = entry.strip().split(":")
+        assert platform_type in FAKE_PLATFORMS, f"Unknown platform {platform_type}"
+        for idx in range(int(count)):
+            devices.append(
+                {
+                    "kind": kind,
+                    "type": platform_type,
+                    "hash": f"{kind}-{idx}",
+                }
+            )
+    return devices
+
+
+def generateTrace(
+    num_jobs, arrival_rate, kinds, num_programs=4, num_models=8, seed=None
+):
+    """A Poisson job arrival trace. arrival_rate is in jobs per simulated
+    second, programs and models are picked with Zipf-like popularity."""
+    rng = random.Random(seed)
+    program_weights = [1.0 / (i + 1) for i in range(num_programs)]
+    model_weights = [1.0 / (i + 1) for i in range(num_models)]
+    trace = []
+    arrival = 0.0
+    for identifier in range(num_jobs):
+        arrival += rng.expovariate(arrival_rate)
+        trace.append(
+            {
+                "arrival": round(arrival, 3),
+                "identifier": identifier,
+                "device": rng.choice(kinds),
+                "program": "program{}".format(
+                    rng.choices(range(num_programs), program_weights)[0]
+                ),
+                "model": "model{}".format(
+                    rng.choices(range(num_models), model_weights)[0]
+                ),
+            }
+        )
+    return trace
+
+
+def _getTraceBenchmarks(entry):
+    return {
+        "info": {
+            "treatment": {
+                "programs": {"program": {"location": entry["program"]}},
+            },
+        },
+        "benchmark": {
+            "content": {
+                "model": {
+                    "name": entry["model"],
+                    "files": {"model": {"location": entry["model"]}},
+                },
+                "tests": [{"metric": "delay"}],
+            },
+        },
+    }
+
+
+class SimulatedLab(RunLab):
+    """
+    A RunLab whose devices are fake platforms. Claiming, selecting and
+    releasing jobs use the real RunLab code, only running them is simulated.
+    """
+
+    def __init__(self, claimer_id, db, devices, profiles, time_scale, seed, args):
+        self.args, _ = run_lab_parser.parse_known_args(
+            [
+                "--claimer_id",
+                claimer_id,
+                "--model_cache",
+                "/tmp",
+                "--platform",
+                "android",
+                "--remote_reporter",
+                "",
+            ]
+            + args
+        )
+        self.db = db
+        self.time_scale = time_scale
+        self.affinity = DeviceAffinity(self.args.affinity_max_defer)
+        self.platforms = {}
+        self.devices = defaultdict(dict)
+        rng = random.Random(seed)
+        for device in devices:
+            platform_class = FAKE_PLATFORMS[device["type"]]
+            self.platforms[device["hash"]] = platform_class(
+                device["hash"],
+                device["kind"],
+                profiles.get(device["type"]),
+                time_scale,
+                random.Random(rng.random()),
+            )
+            self.devices[device["kind"]][device["hash"]] = {
+                "kind": device["kind"],
+                "hash": device["hash"],
+                "name": device["kind"],
+                "abi": "fake",
+                "os": device["type"],
+                "available": True,
+                "live": True,
+            }
+        # simulated seconds each device spent running jobs
+        self.busy_time = defaultdict(float)
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(self.platforms)))
+        self.db.updateDevices(
+            claimer_id, getDevicesString(self._getDeviceList()), True
+        )
+
+    def runUntil(self, stop_event):
+        while not stop_event.is_set():
+            self._runOnce()
+            time.sleep(CLAIM_INTERVAL * self.time_scale)
+        self.executor.shutdown(wait=True)
+
+    def _getDeviceList(self):
+        return [d for kind in self.devices.values() for d in kind.values()]
+
+    def _runBenchmarks(self, jobs_queue):
+        run_ids = ",".join([str(job["id"]) for job in jobs_queue])
+        self.db.runBenchmarks(self.args.claimer_id, run_ids)
+        run_devices = [self.devices[job["device"]][job["hash"]] for job in jobs_queue]
+        self.db.updateDevices(
+            self.args.claimer_id, getDevicesString(run_devices), False
+        )
+        for job in jobs_queue:
+            self.executor.submit(self._runJob, job)
+
+    def _runJob(self, job):
+        device = self.devices[job["device"]][job["hash"]]
+        platform = self.platforms[job["hash"]]
+        start = time.time()
+        success = False
+        try:
+            artifacts = getJobArtifacts(job)
+            platform.preprocess(
+                files=sorted(artifacts["programs"]) + sorted(artifacts["models"])
+            )
+            output, success = platform.runBenchmark(job["benchmarks"]["benchmark"])
+            self.db.doneBenchmarks(
+                job["id"],
+                "DONE" if success else "FAILED",
+                json.dumps(output),
+                "simulated",
+            )
+        except Exception:
+            getLogger().exception(f"Simulated job {job['id']} failed")
+            self.db.doneBenchmarks(job["id"], "FAILED", "", "simulator error")
+        finally:
+            self.busy_time[job["hash"]] += (time.time() - start) / self.time_scale
+            self.affinity.complete(job, success)
+            if not success:
+                # a failed job leaves the device state unknown
+                platform.util.files.clear()
+            platform.coolDown()
+            device["available"] = True
+
+
+class LabSimulator:
+    """
+    Replays a job arrival trace against a SQLite job queue served to one or
+    more simulated lab hosts, and reports throughput, queue wait and device
+    utilization in simulated seconds.
+    """
+
+    def __init__(
+        self,
+        devices,
+        trace,
+        num_hosts=1,
+        profiles=None,
+        time_scale=0.01,
+        seed=None,
+        lab_args=None,
+    ):
+        self.trace = sorted(trace, key=lambda entry: entry["arrival"])
+        self.time_scale = time_scale
+        self.queue = SQLiteJobQueue()
+        self.db = LocalDBDriver(self.queue)
+        self.labs = []
+        for host in range(num_hosts):
+            self.labs.append(
+                SimulatedLab(
+                    f"sim_lab_{host}",
+                    self.db,
+                    devices[host::num_hosts],
+                    profiles or {},
+                    time_scale,
+                    None if seed is None else seed + host,
+                    lab_args or [],
+                )
+            )
+
+    def run(self, timeout=None):
+        stop_event = threading.Event()
+        threads = [
+            threading.Thread(target=lab.runUntil, args=(stop_event,))
+            for lab in self.labs
+        ]
+        self.start = time.time()
+        for thread in threads:
+            thread.start()
+        try:
+            self._replayTrace()
+            while not self._isDone():
+                if timeout is not None and time.time() - self.start > timeout:
+                    getLogger().warning("Simulation timed out.")
+                    break
+                time.sleep(CLAIM_INTERVAL * self.time_scale)
+        finally:
+            self.end = time.time()
+            stop_event.set()
+            for thread in threads:
+                thread.join()
+        return self.getReport()
+
+    def _replayTrace(self):
+        for entry in self.trace:
+            delay = self.start + entry["arrival"] * self.time_scale - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            self.db.submitBenchmarks(
+                _getTraceBenchmarks(entry),
+                entry["device"],
+                entry["identifier"],
+                "simulator",
+            )
+
+    def _isDone(self):
+        jobs = self.queue.getJobs()
+        return len(jobs) == len(self.trace) and all(
+            job["status"] in TERMINAL_STATUSES for job in jobs
+        )
+
+    def getReport(self):
+        jobs = self.queue.getJobs()
+        makespan = (self.end - self.start) / self.time_scale
+        waits = sorted(
+            (job["start_time"] - job["queue_time"]) / self.time_scale
+            for job in jobs
+            if job["start_time"] is not None
+        )
+        finished = [job for job in jobs if job["status"] in TERMINAL_STATUSES]
+        utilization = {}
+        for lab in self.labs:
+            for hash in lab.platforms:
+                utilization[hash] = (
+                    round(lab.busy_time[hash] / makespan, 3) if makespan else 0
+                )
+        affinity = {lab.args.claimer_id: lab.affinity.getStats() for lab in self.labs}
+        return {
+            "jobs": len(jobs),
+            "finished": len(finished),
+            "failed": sum(1 for job in finished if job["status"] != "DONE"),
+            "makespan": round(makespan, 1),
+            "throughput_per_hour": (
+                round(len(finished) / makespan * 3600, 2) if makespan else 0
+            ),
+            "queue_wait_p50": _percentile(waits, 50),
+            "queue_wait_p99": _percentile(waits, 99),
+            "device_utilization": utilization,
+            "mean_utilization": (
+                round(sum(utilization.values()) / len(utilization), 3)
+                if utilization
+                else 0
+            ),
+            "cache_hit_rate": {
+                claimer: stats["hit_rate"] for claimer, stats in affinity.items()
+            },
+        }
+
+
+def _percentile(values, p):
+    """Nearest-rank percentile of sorted values."""
+    if not values:
+        return None
+    rank = max(0, min(len(values) - 1, int(round(p / 100.0 * len(values))) - 1))
+    return round(values[rank], 2)
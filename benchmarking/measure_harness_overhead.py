@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+
+# pyre-unsafe
+
+##############################################################################
+# Copyright 2017-present, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+##############################################################################
+
+
+import argparse
+import functools
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+from data_converters.data_converters import getConverters
+from frameworks.framework_base import FrameworkBase
+from harness import BenchmarkDriver
+from platforms.android.android_platform import AndroidPlatform
+from utils.custom_logger import setLoggerLevel
+
+FAKE_DEVICE_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "platforms", "fake_device"
+)
+
+
+class PhaseTimer:
+    """
+    Accumulates the wall time spent in wrapped methods. The harness runs
+    the platforms in threads, which a profiler on the main thread misses.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.calls = defaultdict(int)
+        self.seconds = defaultdict(float)
+        self.patched = []
+
+    def wrap(self, cls, method, phase):
+        original = cls.__dict__[method]
+
+        @functools.wraps(original)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self.lock:
+                    self.calls[phase] += 1
+                    self.seconds[phase] += elapsed
+
+        setattr(cls, method, timed)
+        self.patched.append((cls, method, original))
+
+    def restore(self):
+        for cls, method, original in reversed(self.patched):
+            setattr(cls, method, original)
+        self.patched = []
+
+parser = argparse.ArgumentParser(
+    description="Measure the per-iteration overhead of the harness by running "
+    "it end to end against the fake adb in platforms/fake_device."
+)
+parser.add_argument(
+    "--iterations",
+    default=10,
+    type=int,
+    help="Number of times the benchmark is repeated.",
+)
+parser.add_argument(
+    "--latency",
+    default="{}",
+    help="A json string with the emulated latency of the fake adb commands, "
+    'e.g. {"default": 0.01, "push": 0.05}.',
+)
+parser.add_argument(
+    "--logger_level",
+    default="warning",
+    choices=["debug", "info", "warning", "error"],
+    help="Specify the logger level",
+)
+parser.add_argument(
+    "--samples",
+    default=50,
+    type=int,
+    help="Number of latency samples the fake benchmark binary prints.",
+)
+
+
+class MeasureHarnessOverhead:
+    def __init__(self, raw_args=None):
+        self.args, self.unknowns = parser.parse_known_args(raw_args)
+        setLoggerLevel(self.args.logger_level)
+
+    def run(self):
+        workdir = tempfile.mkdtemp(prefix="aibench_overhead_")
+        env = dict(os.environ)
+        try:
+            os.environ["PATH"] = (
+                os.path.join(FAKE_DEVICE_DIR, "bin") + os.pathsep + os.environ["PATH"]
+            )
+            os.environ["FAKE_DEVICE_ROOT"] = os.path.join(workdir, "devices")
+            os.environ["FAKE_DEVICE_LATENCY"] = self.args.latency
+            raw_args = self._prepare(workdir)
+            timer = self._getPhaseTimer()
+            try:
+                status = BenchmarkDriver(raw_args=raw_args).run()
+            finally:
+                timer.restore()
+            report = self._getReport(timer, workdir)
+            report["status"] = status
+        finally:
+            os.environ.clear()
+            os.environ.update(env)
+            shutil.rmtree(workdir, True)
+        print(json.dumps(report, indent=2, sort_keys=True))
+        return report
+
+    def _getPhaseTimer(self):
+        timer = PhaseTimer()
+        timer.wrap(FrameworkBase, "runBenchmark", "FrameworkBase.runBenchmark")
+        timer.wrap(AndroidPlatform, "runBenchmark", "AndroidPlatform.runBenchmark")
+        for converter in getConverters().values():
+            timer.wrap(converter, "collect", "converter.collect")
+            timer.wrap(converter, "convert", "converter.convert")
+        return timer
+
+    def _prepare(self, workdir):
+        program = os.path.join(workdir, "fake_benchmark.sh")
+        with open(program, "w") as f:
+            f.write(
+                "#!/bin/sh\n"
+                "i=0\n"
+                f"while [ $i -lt {self.args.samples} ]; do\n"
+                "  echo 'PyTorchObserver {\"type\": \"NET\", \"metric\": "
+                '"latency", "unit": "ms", "value": "1.0"}\'\n'
+                "  i=$((i+1))\n"
+                "done\n"
+            )
+        os.chmod(program, 0o755)
+        benchmark_file = os.path.join(workdir, "benchmark.json")
+        with open(benchmark_file, "w") as f:
+            json.dump(
+                {
+                    "model": {
+                        "name": "fake_model",
+                        "framework": "generic",
+                        "format": "generic",
+                        "repeat": self.args.iterations,
+                        "files": {},
+                    },
+                    "tests": [
+                        {
+                            "identifier": "fake",
+                            "metric": "generic",
+                            "commands": ["{program}"],
+                            "iter": 1,
+                            "warmup": 0,
+                        }
+                    ],
+                },
+                f,
+            )
+        info = {
+            "treatment": {
+                "programs": {"program": {"location": program}},
+                "commit": "fake",
+                "commit_time": 0,
+            }
+        }
+        return [
+            "--benchmark_file",
+            benchmark_file,
+            "--framework",
+            "generic",
+            "--info",
+            json.dumps(info),
+            "--model_cache",
+            os.path.join(workdir, "model_cache"),
+            "--platform",
+            "android",
+            "--device",
+            "fake0",
+        ] + self.unknowns
+
+    def _getReport(self, timer, workdir):
+        iterations = self.args.iterations
+        report = {"iterations": iterations, "phases": {}}
+        for phase in sorted(timer.calls):
+            report["phases"][phase] = {
+                "calls": timer.calls[phase],
+                "seconds_per_iteration": round(timer.seconds[phase] / iterations, 6),
+            }
+
+        commands = []
+        log = os.path.join(workdir, "devices", "commands.jsonl")
+        if os.path.isfile(log):
+            with open(log) as f:
+                commands = [json.loads(line) for line in f]
+        binary = sum(
+            c["elapsed"]
+            for c in commands
+            if c["cmd"] == "shell" and c["args"] and "fake_benchmark" in c["args"][0]
+        )
+        device = sum(c["elapsed"] for c in commands)
+        framework = report["phases"].get(
+            "FrameworkBase.runBenchmark", {"seconds_per_iteration": 0.0}
+        )
+        report["adb_calls_per_iteration"] = round(len(commands) / iterations, 2)
+        report["adb_seconds_per_iteration"] = round(device / iterations, 6)
+        report["binary_seconds_per_iteration"] = round(binary / iterations, 6)
+        # everything FrameworkBase.runBenchmark spends outside the binary
+        report["overhead_seconds_per_iteration"] = round(
+            framework["seconds_per_iteration"] - binary / iterations, 6
+        )
+        return report
+
+
+if __name__ == "__main__":
+    app = MeasureHarnessOverhead()
+    app.run()
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+
+# pyre-unsafe
+
+##############################################################################
+# Copyright 2017-present, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+##############################################################################
+
+
+import argparse
+import json
+import time
+
+import numpy as np
+from utils.power_utils import get_benchmark_start_end
+
+parser = argparse.ArgumentParser(
+    description="Time the benchmark window detection of the power "
+    "post-processing on a synthetic Monsoon trace."
+)
+parser.add_argument(
+    "--baseline_power",
+    default=900.0,
+    type=float,
+    help="Idle power of the synthetic trace in mW.",
+)
+parser.add_argument(
+    "--benchmark_power",
+    default=1400.0,
+    type=float,
+    help="Power of the synthetic trace while the benchmark runs in mW.",
+)
+parser.add_argument(
+    "--duration",
+    default=600,
+    type=float,
+    help="Length of the synthetic trace in seconds.",
+)
+parser.add_argument(
+    "--noise",
+    default=150.0,
+    type=float,
+    help="Standard deviation of the gaussian noise of the trace in mW.",
+)
+parser.add_argument(
+    "--reference",
+    action="store_true",
+    help="Also time the per-sample sliding update the window detection "
+    "used before, and check both find the same window.",
+)
+parser.add_argument(
+    "--repeat",
+    default=3,
+    type=int,
+    help="Number of timed runs, the best one is reported.",
+)
+parser.add_argument(
+    "--sample_rate",
+    default=5000,
+    type=int,
+    help="Samples per second, the Monsoon samples every 200us.",
+)
+parser.add_argument(
+    "--seed",
+    default=0,
+    type=int,
+    help="Seed of the synthetic trace.",
+)
+
+
+def _referenceStartEnd(data, window_size):
+    half_window_size = window_size // 2
+    conv_output = [
+        np.sum(data[half_window_size:window_size]) - np.sum(data[:half_window_size])
+    ]
+    for i in range(0, len(data) - window_size):
+        conv_output.append(
+            conv_output[-1]
+            + data[i]
+            - (2 * data[i + half_window_size])
+            + data[i + window_size]
+        )
+    conv_output = np.array(conv_output)
+    return (
+        int(np.argmax(conv_output)) + half_window_size,
+        int(np.argmin(conv_output)) + half_window_size,
+    )
+
+
+class MeasurePowerWindow:
+    def __init__(self, raw_args=None):
+        self.args, self.unknowns = parser.parse_known_args(raw_args)
+
+    def run(self):
+        power, expected = self._getTrace()
+        # post_process_power_data uses a 10 second window
+        window_size = 10 * self.args.sample_rate
+        report = {
+            "samples": len(power),
+            "expected": expected,
+            "found": [int(i) for i in get_benchmark_start_end(power, window_size)],
+            "seconds": self._time(get_benchmark_start_end, power, window_size),
+        }
+        if self.args.reference:
+            samples = power.tolist()
+            report["reference_found"] = list(_referenceStartEnd(samples, window_size))
+            report["reference_seconds"] = self._time(
+                _referenceStartEnd, samples, window_size, repeat=1
+            )
+            report["speedup"] = round(
+                report["reference_seconds"] / report["seconds"], 1
+            )
+        print(json.dumps(report, indent=2, sort_keys=True))
+        return report
+
+    def _getTrace(self):
+        rng = np.random.default_rng(self.args.seed)
+        num_samples = int(self.args.duration * self.args.sample_rate)
+        # the benchmark runs in the middle third of the capture
+        start, end = num_samples // 3, 2 * num_samples // 3
+        power = np.full(num_samples, self.args.baseline_power)
+        power[start:end] = self.args.benchmark_power
+        power += rng.normal(0, self.args.noise, num_samples)
+        return power, [start, end]
+
+    def _time(self, func, data, window_size, repeat=None):
+        best = None
+        for _ in range(repeat or self.args.repeat):
+            start = time.perf_counter()
+            func(data, window_size)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return round(best, 6)
+
+
+if __name__ == "__main__":
+    app = MeasurePowerWindow()
+    app.run()
@@ -0,0 +1,190 @@
+##############################################################################
+# Copyright 2022-present, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+##############################################################################
+
+# pyre-unsafe
+
+import math
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from metrics.histograms import DEFAULT_LATENCY_BUCKETS, LatencyHistogram
+from utils.custom_logger import getLogger
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+# Upper bounds in seconds for whole jobs and their phases, up to 40 minutes.
+JOB_LATENCY_BUCKETS = (
+    0.1,
+    0.5,
+    1.0,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+    600.0,
+    1200.0,
+    2400.0,
+)
+
+
+class MetricsRegistry:
+    """
+    Thread-safe counters, gauges and latency histograms of a lab host,
+    rendered in the Prometheus text exposition format. Collectors are
+    called on every scrape to refresh gauges derived from other state.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # name -> {"type", "help", "values": {labels: float or LatencyHistogram}}
+        self._metrics = {}
+        self._collectors = []
+
+    def incCounter(self, name, help, value=1, **labels):
+        with self._lock:
+            values = self._getValues(name, "counter", help)
+            key = _labelsKey(labels)
+            values[key] = values.get(key, 0) + value
+
+    def setGauge(self, name, help, value, **labels):
+        with self._lock:
+            self._getValues(name, "gauge", help)[_labelsKey(labels)] = value
+
+    def clearGauge(self, name):
+        """Drop all label sets of a gauge, e.g. before a collector refills it."""
+        with self._lock:
+            if name in self._metrics:
+                self._metrics[name]["values"].clear()
+
+    def getHistogram(self, name, help, buckets=None, **labels):
+        """Return the LatencyHistogram of the label set, creating it if needed."""
+        with self._lock:
+            values = self._getValues(name, "histogram", help)
+            key = _labelsKey(labels)
+            if key not in values:
+                values[key] = LatencyHistogram(buckets or DEFAULT_LATENCY_BUCKETS)
+            return values[key]
+
+    def observe(self, name, help, value, buckets=None, **labels):
+        self.getHistogram(name, help, buckets, **labels).observe(value)
+
+    def addCollector(self, collector):
+        """collector(registry) is called before each scrape."""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def removeCollector(self, collector):
+        with self._lock:
+            if collector in self._collectors:
+                self._collectors.remove(collector)
+
+    def render(self):
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            try:
+                collector(self)
+            except Exception:
+                getLogger().exception("Metrics collector failed.")
+        lines = []
+        with self._lock:
+            metrics = {
+                name: dict(metric, values=dict(metric["values"]))
+                for name, metric in self._metrics.items()
+            }
+        for name in sorted(metrics):
+            metric = metrics[name]
+            lines.append(f"# HELP {name} {_escapeHelp(metric['help'])}")
+            lines.append(f"# TYPE {name} {metric['type']}")
+            for key in sorted(metric["values"]):
+                value = metric["values"][key]
+                if metric["type"] == "histogram":
+                    lines.extend(_renderHistogram(name, key, value))
+                else:
+                    lines.append(f"{name}{_renderLabels(key)} {_formatValue(value)}")
+        return "".join(line + "\n" for line in lines)
+
+    def _getValues(self, name, type, help):
+        if name not in self._metrics:
+            self._metrics[name] = {"type": type, "help": help, "values": {}}
+        metric = self._metrics[name]
+        assert metric["type"] == type, f"Metric {name} is a {metric['type']}"
+        return metric["values"]
+
+
+def _labelsKey(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escapeHelp(help):
+    return help.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _renderLabels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = [
+        '{}="{}"'.format(
+            k, v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        )
+        for k, v in pairs
+    ]
+    return "{" + ",".join(escaped) + "}"
+
+
+def _formatValue(value):
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _renderHistogram(name, key, histogram):
+    snapshot = histogram.snapshot()
+    lines = []
+    for bound, count in snapshot["buckets"].items():
+        le = _formatValue(bound) if math.isinf(bound) else repr(float(bound))
+        lines.append(f"{name}_bucket{_renderLabels(key, [('le', le)])} {count}")
+    lines.append(f"{name}_sum{_renderLabels(key)} {_formatValue(snapshot['sum'])}")
+    lines.append(f"{name}_count{_renderLabels(key)} {snapshot['count']}")
+    return lines
+
+
+# The registry of this process, like the counter handles in metrics.counters
+registry = MetricsRegistry()
+
+
+def getMetricsRegistry():
+    return registry
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        data = self.server.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serveMetrics(port, host="127.0.0.1", registry=None):
+    """Serve the registry at http://<host>:<port>/metrics from a daemon thread."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.registry = registry or getMetricsRegistry()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
@@ -0,0 +1,74 @@
+##############################################################################
+# Copyright 2022-present, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+##############################################################################
+
+# pyre-unsafe
+
+import bisect
+import threading
+
+# Upper bounds in seconds, the last bucket catches everything above.
+DEFAULT_LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class LatencyHistogram:
+    """Thread-safe cumulative latency histogram with fixed buckets."""
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.max = max(self.max, value)
+
+    def snapshot(self) -> dict:
+        """Return cumulative bucket counts keyed by upper bound, plus totals."""
+        with self._lock:
+            cumulative = {}
+            total = 0
+            for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+                total += count
+                cumulative[bound] = total
+            return {
+                "buckets": cumulative,
+                "count": self.count,
+                "sum": self.sum,
+                "max": self.max,
+            }
+
+    def percentile(self, p: float):
+        """Estimate the p-th percentile as the upper bound of its bucket."""
+        with self._lock:
+            if self.count == 0:
+                return None
+            rank = p / 100.0 * self.count
+            total = 0
+            for bound, count in zip(self.buckets, self.counts):
+                total += count
+                if total >= rank:
+                    return bound
+            return self.max
+
+    def summary(self) -> str:
+        if self.count == 0:
+            return "count=0"
+        return "count={} mean={:.3f}s p50<={}s p90<={}s p99<={}s max={:.3f}s".format(
+            self.count,
+            self.sum / self.count,
+            self.percentile(50),
+            self.percentile(90),
+            self.percentile(99),
+            self.max,
+        )
@@ -20,7 +20,7 @@ import time
 import pkg_resources
 from degrade.degrade_base import DegradeBase, getDegrade
 from platforms.platform_base import PlatformBase
-from platforms.thermal_monitor import ThermalMonitor
+from platforms.thermal_monitor import createThermalStream, ThermalMonitor
 from profilers.perfetto.perfetto import (
     Perfetto,
     perfetto_types_supported,
@@ -94,6 +94,8 @@ class AndroidPlatform(PlatformBase):
                 )
         except Exception:
             getLogger().exception("Could not load thermal mapping")
+        # started on the first run of a job and shared by its runs
+        self.thermal_stream = None
         # Silently set time if possible.
         date_time_string = time.strftime("%m%d%H%M%Y.%S")
         if adb.isRootedDevice(silent=True):
@@ -102,6 +104,13 @@ class AndroidPlatform(PlatformBase):
     def getKind(self):
         return self.platform
 
+    def resetForJob(self, tempdir, args):
+        super().resetForJob(tempdir, args)
+        self.degrade_constraints = None
+        self._stopThermalStream()
+        if self.args.set_freq:
+            self.util.setFrequency(self.args.set_freq)
+
     def getOS(self):
         return f"Android {self.rel_version} sdk {self.build_version}"
 
@@ -212,11 +221,22 @@ class AndroidPlatform(PlatformBase):
                 log, meta = self.runAppBenchmark(cmd, *args, **kwargs)
             else:
                 thermal_logs = []
-                with ThermalMonitor(
-                    thermal_logs, self.util, self.thermal_monitor_config, " ".join(cmd)
-                ):
+                if self.thermal_stream is None:
+                    self.thermal_stream = createThermalStream(
+                        self.util, self.thermal_monitor_config
+                    )
+                monitor = ThermalMonitor(
+                    thermal_logs,
+                    self.util,
+                    self.thermal_monitor_config,
+                    " ".join(cmd),
+                    stream=self.thermal_stream,
+                )
+                with monitor:
                     log, meta = self.runBinaryBenchmark(cmd, *args, **kwargs)
                 log += thermal_logs
+                if monitor.readings is not None:
+                    meta["thermal_readings"] = monitor.readings
             return log, meta
 
     def runAppBenchmark(self, cmd, *args, **kwargs):
@@ -432,4 +452,10 @@ class AndroidPlatform(PlatformBase):
         return {"unit": "mAh", "metric": "batteryLevel"}
 
     def cleanup(self):
+        self._stopThermalStream()
         self.util.shell(["rm", "-rf", self.tgt_dir + "*"])
+
+    def _stopThermalStream(self):
+        if self.thermal_stream is not None:
+            self.thermal_stream.stop()
+            self.thermal_stream = None
@@ -23,17 +23,26 @@ from threading import Thread
 from bridge.db import DBDriver
 from get_connected_devices import GetConnectedDevices
 from metrics.counters import Counter
+from metrics.exporter import getMetricsRegistry
+from metrics.histograms import LatencyHistogram
 from platforms.android.adb import ADB
 from platforms.battery_state import getBatteryState
+from platforms.device_readiness import parseReadinessBands, ReadinessGate
 from platforms.platforms import getDeviceList
 from reboot_device import reboot as reboot_device
 from utils.acroname_usb_controller import AcronameUSBController
 from utils.custom_logger import getLogger
+from utils.utilities import closeAsyncHttpSession
 
 
 REBOOT_INTERVAL = datetime.timedelta(hours=8)
 MINIMUM_DM_INTERVAL = 10
 DEFAULT_DM_INTERVAL = 10
+DEFAULT_DM_TASK_TIMEOUT = 60
+DEVICE_DISCOVERY_TIMEOUT = 30
+DEVICE_PROBE_TIMEOUT = 15
+# Log the monitor task latency histograms every this many monitor cycles.
+LATENCY_REPORT_CYCLES = 60
 
 
 def getDevicesString(devices):
@@ -94,35 +103,112 @@ class DeviceManager:
                     "Could not load device counter!  Counters will not be updated for this server!"
                 )
         self.device_monitor_interval = self.args.device_monitor_interval
+        self.device_monitor_timeout = self.args.device_monitor_timeout
+        self.task_latency = defaultdict(LatencyHistogram)
+        self.task_timeouts = defaultdict(int)
         self.async_event_loop = None
-        self.device_monitor = Thread(target=self._runDeviceMonitor)
-        self.device_monitor.start()
-
         self.usb_controller = (
             AcronameUSBController(hub_map=self.args.usb_hub_device_mapping)
             if self.args.usb_hub_device_mapping
             else AcronameUSBController()
         )
+        getMetricsRegistry().addCollector(self.collectMetrics)
+        self.device_monitor = Thread(target=self._runDeviceMonitor)
+        self.device_monitor.start()
 
     def getLabDevices(self):
         """Return a reference to the lab's device meta data."""
         return self.lab_devices
 
+    def collectMetrics(self, registry):
+        """Export the number of lab devices of each kind in each state."""
+        states = defaultdict(int)
+        for kind, devices in list(self.lab_devices.items()):
+            for device in list(devices.values()):
+                states[(kind, _getDeviceState(device))] += 1
+        registry.clearGauge("aibench_lab_devices")
+        for (kind, state), count in states.items():
+            registry.setGauge(
+                "aibench_lab_devices",
+                "Lab devices by kind and state.",
+                count,
+                kind=kind,
+                state=state,
+            )
+
+    def getTaskLatencies(self):
+        """Return a snapshot of the latency histogram of each monitor task."""
+        return {name: h.snapshot() for name, h in self.task_latency.items()}
+
     async def _asyncRunDeviceMonitor(self):
-        """Async function with device monitoring loop.  Heartbeats and counters are updated with non-blocking aiohttp calls."""
+        """Async function with device monitoring loop. Device discovery, device probes,
+        heartbeats and counters run as concurrent tasks, each bounded by a timeout,
+        so that one slow device or request cannot stall the others."""
         await self._initCounters()
+        cycles = 0
         while self.running:
-            # if the lab is hosting mobile devices, thread will monitor connectivity of devices.
-            if self.args.platform.startswith(
-                "android"
-            ) or self.args.platform.startswith("ios"):
-                # mobile-only logic
-                await self._checkDevices()
-                await self._updateCounters()
-            await self._updateHeartbeats()
-            # await asyncio.sleep(self.device_monitor_interval)
-            time.sleep(self.device_monitor_interval)
+            start = time.monotonic()
+            await self._monitorOnce()
+            cycles += 1
+            if cycles % LATENCY_REPORT_CYCLES == 0:
+                self._reportTaskLatencies()
+            elapsed = time.monotonic() - start
+            await asyncio.sleep(max(self.device_monitor_interval - elapsed, 0))
         await self._initCounters()
+        await closeAsyncHttpSession()
+
+    async def _monitorOnce(self):
+        # if the lab is hosting mobile devices, thread will monitor connectivity of devices.
+        mobile = self.args.platform.startswith(
+            "android"
+        ) or self.args.platform.startswith("ios")
+        tasks = [self._timedTask("heartbeat", self._updateHeartbeats())]
+        if mobile:
+            # mobile-only logic
+            tasks.append(self._timedTask("check_devices", self._checkDevices()))
+        await asyncio.gather(*tasks)
+        if mobile:
+            await self._timedTask("counters", self._updateCounters())
+
+    async def _timedTask(self, name, coro, timeout=None):
+        """Await coro with a timeout and record its latency under name.
+        Returns None if the task timed out or raised."""
+        timeout = self.device_monitor_timeout if timeout is None else timeout
+        start = time.monotonic()
+        try:
+            return await asyncio.wait_for(coro, timeout)
+        except asyncio.TimeoutError:
+            self.task_timeouts[name] += 1
+            getMetricsRegistry().incCounter(
+                "aibench_device_monitor_task_timeouts_total",
+                "Device monitor tasks that timed out.",
+                task=name,
+            )
+            getLogger().error(f"Device monitor task {name} timed out after {timeout}s.")
+        except Exception:
+            getLogger().exception(f"Device monitor task {name} failed.")
+        finally:
+            elapsed = time.monotonic() - start
+            self.task_latency[name].observe(elapsed)
+            getMetricsRegistry().observe(
+                "aibench_device_monitor_task_seconds",
+                "Latency of the device monitor tasks.",
+                elapsed,
+                task=name,
+            )
+        return None
+
+    async def _runBlocking(self, func, *args):
+        """Run a blocking call on the default executor of the monitor loop."""
+        return await self.async_event_loop.run_in_executor(None, func, *args)
+
+    def _reportTaskLatencies(self):
+        for name in sorted(self.task_latency):
+            getLogger().info(
+                "Device monitor task {}: {} timeouts={}".format(
+                    name, self.task_latency[name].summary(), self.task_timeouts[name]
+                )
+            )
 
     def _runDeviceMonitor(self):
         self.async_event_loop = asyncio.new_event_loop()
@@ -133,8 +219,15 @@ class DeviceManager:
     async def _checkDevices(self):
         """Run any device health checks, e.g. connectivity, battery, etc."""
         try:
-            online_hashes = getDeviceList(self.args, silent=True)
-            self._handleDCDevices(online_hashes)
+            online_hashes = await self._timedTask(
+                "discovery",
+                self._runBlocking(getDeviceList, self.args, True),
+                DEVICE_DISCOVERY_TIMEOUT,
+            )
+            if online_hashes is None:
+                raise RuntimeError("Device discovery did not complete.")
+            online_hashes = await self._probeDevices(online_hashes)
+            await self._handleDCDevices(online_hashes)
             await self._handleNewDevices(online_hashes)
             self.failed_device_checks = 0
         except Exception:
@@ -146,6 +239,46 @@ class DeviceManager:
                     "Persistent error while checking devices.", exc_info=True
                 )
 
+    async def _probeDevices(self, online_hashes):
+        """Concurrently probe every discovered device and return the hashes of
+        the devices that answered."""
+        hashes = list(online_hashes)
+        results = await asyncio.gather(
+            *[
+                self._timedTask("probe", self._probeDevice(h), DEVICE_PROBE_TIMEOUT)
+                for h in hashes
+            ]
+        )
+        healthy = []
+        for h, result in zip(hashes, results):
+            if result is False:
+                getLogger().warning(f"Device {h} did not respond to health probe.")
+            else:
+                healthy.append(h)
+        return healthy
+
+    async def _probeDevice(self, hash):
+        """Check that an android device answers a shell command. Returns None
+        when the device is not probed."""
+        if not self.args.platform.startswith("android"):
+            return None
+        proc = await asyncio.create_subprocess_exec(
+            "adb",
+            "-s",
+            hash,
+            "shell",
+            "echo",
+            "ok",
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        try:
+            stdout, _ = await proc.communicate()
+        except asyncio.CancelledError:
+            proc.kill()
+            raise
+        return proc.returncode == 0 and stdout.strip() == b"ok"
+
     def _attempt_device_reconnect(self, hash):
         getLogger().info(f"Attempting reconnect of device with hash {hash}.")
         if not self.usb_controller:
@@ -167,54 +300,67 @@ class DeviceManager:
             getLogger().exception(f"Device reconnect failed for {hash}")
             return False
 
-    def _handleDCDevices(self, online_hashes):
+    async def _handleDCDevices(self, online_hashes):
         """
         If there are devices we expect to be connected to the host,
         check if they are rebooting or have been put offline by the USBController,
         else mark the device as unavailable and offline. After dc_threshold times
         that the device is not seen, remove it completely and critically log.
+        Reconnect attempts of different devices run concurrently.
         """
         for h in online_hashes:
             if h in self.device_dc_count:
                 device = [d for d in self.online_devices if d["hash"] == h][0]
                 getLogger().info(f"Device {device} has reconnected.")
                 self.device_dc_count.pop(h)
-                self._enableDevice(device)
+                await self._runBlocking(self._enableDevice, device)
         dc_devices = [
             device
             for device in self.online_devices
             if device["hash"] not in online_hashes
         ]
-        for dc_device in dc_devices:
-            kind = dc_device["kind"]
-            hash = dc_device["hash"]
-            lab_device = self.lab_devices[kind][hash]
-            usb_disabled = False
-            if self.usb_controller and not self.usb_controller.active.get(hash, True):
-                usb_disabled = True
-            if "rebooting" not in lab_device and not usb_disabled:
-                if hash not in self.device_dc_count:
-                    getLogger().error(
-                        f"Device {dc_device} is disconnected and has been marked unavailable for benchmarking.",
+        await asyncio.gather(
+            *[self._handleDCDevice(dc_device) for dc_device in dc_devices]
+        )
+
+    async def _handleDCDevice(self, dc_device):
+        kind = dc_device["kind"]
+        hash = dc_device["hash"]
+        lab_device = self.lab_devices[kind][hash]
+        usb_disabled = False
+        if self.usb_controller and not self.usb_controller.active.get(hash, True):
+            usb_disabled = True
+        if "rebooting" not in lab_device and not usb_disabled:
+            if hash not in self.device_dc_count:
+                getLogger().error(
+                    f"Device {dc_device} is disconnected and has been marked unavailable for benchmarking.",
+                )
+                await self._runBlocking(self._disableDevice, dc_device)
+            self.device_dc_count[hash] += 1
+            dc_count = self.device_dc_count[hash]
+            if dc_count < self.dc_threshold:
+                getLogger().error(
+                    f"Device {dc_device} has shown as disconnected {dc_count} time(s) ({dc_count * self.device_monitor_interval}s)",
+                )
+            elif dc_count == self.dc_threshold:
+                reconnect = await self._timedTask(
+                    "reconnect",
+                    self._runBlocking(self._attempt_device_reconnect, hash),
+                )
+                if reconnect:
+                    getLogger().warning(
+                        f"Device {dc_device} has shown as disconnected {dc_count} time(s) and was able to be reconnected."
                     )
-                    self._disableDevice(dc_device)
-                self.device_dc_count[hash] += 1
-                dc_count = self.device_dc_count[hash]
-                if dc_count < self.dc_threshold:
-                    getLogger().error(
-                        f"Device {dc_device} has shown as disconnected {dc_count} time(s) ({dc_count * self.device_monitor_interval}s)",
+                else:
+                    device_offline_message = f"Device {dc_device} has shown as disconnected {dc_count} time(s) ({dc_count * self.device_monitor_interval}s) and is offline."
+                    getLogger().error(device_offline_message)
+                    getMetricsRegistry().incCounter(
+                        "aibench_device_offline_total",
+                        "Devices that went offline after repeated disconnects.",
+                        kind=kind,
                     )
-                elif dc_count == self.dc_threshold:
-                    reconnect = self._attempt_device_reconnect(hash)
-                    if reconnect:
-                        getLogger().warning(
-                            f"Device {dc_device} has shown as disconnected {dc_count} time(s) and was able to be reconnected."
-                        )
-                    else:
-                        device_offline_message = f"Device {dc_device} has shown as disconnected {dc_count} time(s) ({dc_count * self.device_monitor_interval}s) and is offline."
-                        getLogger().error(device_offline_message)
-                        self.online_devices.remove(dc_device)
-                    self.device_dc_count.pop(hash)
+                    self.online_devices.remove(dc_device)
+                self.device_dc_count.pop(hash)
 
     async def _handleNewDevices(self, online_hashes):
         """
@@ -228,10 +374,10 @@ class DeviceManager:
         ]
         if new_devices:
             devices = ",".join(new_devices)
-            devices = self._getDevices(devices)
+            devices = await self._runBlocking(self._getDevices, devices)
             if devices:
                 for d in devices:
-                    self._enableDevice(d)
+                    await self._runBlocking(self._enableDevice, d)
                     if d["hash"] not in [
                         device["hash"] for device in self.online_devices
                     ]:
@@ -391,6 +537,15 @@ class DeviceManager:
     def shutdown(self):
         self.db.updateDevices(self.args.claimer_id, "", True)
         self.running = False
+        getMetricsRegistry().removeCollector(self.collectMetrics)
+
+
+def _getDeviceState(device):
+    if not device.get("live", True):
+        return "offline"
+    if device.get("rebooting"):
+        return "rebooting"
+    return "available" if device.get("available") else "busy"
 
 
 class CoolDownDevice(Thread):
@@ -436,7 +591,14 @@ class CoolDownDevice(Thread):
             raw_args.extend(["--device", self.device["hash"]])
             raw_args.extend(["--android_dir", self.args.android_dir])
             self.device["rebooting"] = True
-            if reboot_device(raw_args=raw_args):
+            rebooted = reboot_device(raw_args=raw_args)
+            getMetricsRegistry().incCounter(
+                "aibench_device_reboots_total",
+                "Device reboots after jobs, by result.",
+                kind=self.device["kind"],
+                result="success" if rebooted else "failure",
+            )
+            if rebooted:
                 getLogger().info(f"Device {self.device} was rebooted.")
                 self.device["reboot_time"] = datetime.datetime.now()
             else:
@@ -444,9 +606,41 @@ class CoolDownDevice(Thread):
                 getLogger().critical(f"Device {self.device} could not be rebooted.")
                 success = False
 
+        if self.args.adaptive_cooldown:
+            gate = ReadinessGate(
+                self.device["hash"],
+                self.args.platform,
+                self.args.android_dir,
+                max_wait=self.args.cooldown_max_wait,
+                bands=parseReadinessBands(self.args.cooldown_bands),
+                fallback_wait=self.cooldown,
+            )
+            # recorded in the meta of the next job run on this device
+            self.device["cooldown"] = gate.wait()
+        else:
+            self._fixedCoolDown()
+
+        # device should be available again, remove rebooting flag.
+        if "rebooting" in self.device:
+            del self.device["rebooting"]
+        if success:
+            self.device["available"] = True
+            device_str = getDevicesString([self.device])
+            self.db.updateDevices(self.args.claimer_id, device_str, False)
+            getLogger().info(
+                "Device {}({}) available".format(
+                    self.device["kind"], self.device["hash"]
+                )
+            )
+        else:
+            self.device["live"] = False
+        getLogger().info("CoolDownDevice lock released")
+
+    def _fixedCoolDown(self):
         not_ready = True
         charge_threshold = 30  # REVIEW
         getLogger().info(f"Sleep {self.cooldown} seconds.")
+        start = time.monotonic()
         while not_ready:
             # sleep for device cooldown
             time.sleep(self.cooldown)
@@ -464,19 +658,7 @@ class CoolDownDevice(Thread):
                 continue
 
             not_ready = False
-
-        # device should be available again, remove rebooting flag.
-        if "rebooting" in self.device:
-            del self.device["rebooting"]
-        if success:
-            self.device["available"] = True
-            device_str = getDevicesString([self.device])
-            self.db.updateDevices(self.args.claimer_id, device_str, False)
-            getLogger().info(
-                "Device {}({}) available".format(
-                    self.device["kind"], self.device["hash"]
-                )
-            )
-        else:
-            self.device["live"] = False
-        getLogger().info("CoolDownDevice lock released")
+        self.device["cooldown"] = {
+            "cooldown_time": round(time.monotonic() - start, 3),
+            "cooldown_adaptive": False,
+        }
@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+
+# pyre-unsafe
+
+##############################################################################
+# Copyright 2022-present, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+##############################################################################
+
+
+import json
+import time
+from typing import Any
+
+from platforms.android.adb import ADB
+from platforms.battery_state import getBatteryState
+from utils.custom_logger import getLogger
+
+# Bands a device must be within, and stay stable within, before it is
+# released for the next run. Temperatures are in degrees Celsius.
+DEFAULT_READINESS_BANDS = {
+    "max_thermal_temp": 45.0,
+    "max_battery_temp": 38.0,
+    "min_charge_level": 30,
+    # maximum spread of a temperature over the last stable_samples samples
+    "stable_delta": 1.0,
+    "stable_samples": 3,
+    "sample_interval": 5.0,
+}
+DEFAULT_COOLDOWN_MAX_WAIT = 600
+
+THERMAL_ZONES_CMD = (
+    "for z in /sys/class/thermal/thermal_zone*; do "
+    "echo $(cat $z/type 2>/dev/null) $(cat $z/temp 2>/dev/null); done"
+)
+
+
+def parseReadinessBands(bands_str):
+    """Merge the json encoded bands over the defaults."""
+    bands = dict(DEFAULT_READINESS_BANDS)
+    if bands_str:
+        bands.update(json.loads(bands_str))
+    return bands
+
+
+def _toCelsius(value):
+    # sysfs reports millidegrees on most devices and tenths on some
+    value = float(value)
+    if abs(value) >= 1000:
+        return value / 1000.0
+    if abs(value) >= 200:
+        return value / 10.0
+    return value
+
+
+def getThermalZones(util: ADB) -> dict[str, float]:
+    """Read all thermal zones of an android device in one shell call."""
+    zones = {}
+    rows = util.shell([THERMAL_ZONES_CMD], retry=1, silent=True, ignore_status=True)
+    for idx, row in enumerate(rows or []):
+        items = row.strip().split()
+        if len(items) < 2:
+            continue
+        try:
+            temp = _toCelsius(items[-1])
+        except ValueError:
+            continue
+        name = "_".join(items[:-1]) or f"zone{idx}"
+        if name in zones:
+            name = f"{name}_{idx}"
+        zones[name] = temp
+    return zones
+
+
+def _getDumpsysBattery(util: ADB) -> dict[str, Any]:
+    """Battery level and temperature for unrooted devices."""
+    state = {}
+    rows = util.shell(["dumpsys", "battery"], retry=1, silent=True, ignore_status=True)
+    for row in rows or []:
+        key, _, value = row.strip().partition(":")
+        try:
+            if key == "level":
+                state["charge_level"] = int(value)
+            elif key == "temperature":
+                state["battery_temperature"] = int(value) / 10.0
+        except ValueError:
+            pass
+    return state
+
+
+def getDeviceReadings(device, platform: str, android_dir: str) -> dict[str, Any]:
+    """Sample thermal zones, battery temperature and charge of a device.
+    Readings the device does not support are None."""
+    readings: dict[str, Any] = {
+        "thermal_zones": {},
+        "max_thermal_temp": None,
+        "battery_temperature": None,
+        "charge_level": None,
+    }
+    if not platform.startswith("android"):
+        return readings
+    try:
+        util = ADB(device, android_dir)
+        zones = getThermalZones(util)
+        readings["thermal_zones"] = zones
+        # ignore obviously invalid sensors
+        valid = [t for t in zones.values() if 0 < t < 150]
+        if valid:
+            readings["max_thermal_temp"] = max(valid)
+        battery_state = getBatteryState(device, platform, android_dir)
+        if battery_state["supported"]:
+            readings["charge_level"] = battery_state["charge_level"]
+            readings["battery_temperature"] = battery_state["temperature"] / 10.0
+        else:
+            readings.update(_getDumpsysBattery(util))
+    except Exception:
+        getLogger().exception(f"Failed to sample readiness of device {device}")
+    return readings
+
+
+class ReadinessGate:
+    """
+    Holds a device until its temperatures and charge are within the configured
+    bands and have been stable for a few samples, or max_wait seconds elapsed.
+    Devices that report no readings fall back to a fixed sleep of fallback_wait.
+    """
+
+    def __init__(
+        self,
+        device,
+        platform: str,
+        android_dir: str,
+        max_wait: float = DEFAULT_COOLDOWN_MAX_WAIT,
+        bands=None,
+        fallback_wait: float = 0,
+    ):
+        self.device = device
+        self.platform = platform
+        self.android_dir = android_dir
+        self.max_wait = max_wait
+        self.bands = dict(DEFAULT_READINESS_BANDS)
+        if bands:
+            self.bands.update(bands)
+        self.fallback_wait = fallback_wait
+
+    def wait(self) -> dict[str, Any]:
+        start = time.monotonic()
+        history = [self._sample()]
+        if not self._hasReadings(history[0]):
+            getLogger().info(
+                f"No thermal or battery readings for device {self.device}, "
+                f"sleep {self.fallback_wait} seconds."
+            )
+            time.sleep(self.fallback_wait)
+            return self._record(start, history, ready=False, adaptive=False)
+
+        ready = False
+        while True:
+            if self._isReady(history):
+                ready = True
+                break
+            remaining = self.max_wait - (time.monotonic() - start)
+            if remaining <= 0:
+                break
+            time.sleep(min(self.bands["sample_interval"], remaining))
+            history.append(self._sample())
+            # keep only what the stability check needs
+            history = history[:1] + history[1:][-self.bands["stable_samples"] :]
+        record = self._record(start, history, ready=ready, adaptive=True)
+        if ready:
+            getLogger().info(
+                "Device {} ready after {:.1f}s: max thermal {}C, battery {}C, charge {}%".format(
+                    self.device,
+                    record["cooldown_time"],
+                    record["cooldown_max_thermal_temp"],
+                    record["cooldown_battery_temp"],
+                    record["cooldown_charge_level"],
+                )
+            )
+        else:
+            getLogger().warning(
+                f"Device {self.device} not within readiness bands after "
+                f"{self.max_wait}s, releasing it anyway. Readings: {history[-1]}"
+            )
+        return record
+
+    def _sample(self):
+        return getDeviceReadings(self.device, self.platform, self.android_dir)
+
+    def _hasReadings(self, readings):
+        return any(
+            readings[k] is not None
+            for k in ("max_thermal_temp", "battery_temperature", "charge_level")
+        )
+
+    def _isReady(self, history):
+        latest = history[-1]
+        bands = self.bands
+        if (
+            latest["charge_level"] is not None
+            and latest["charge_level"] < bands["min_charge_level"]
+        ):
+            return False
+        if (
+            latest["max_thermal_temp"] is not None
+            and latest["max_thermal_temp"] > bands["max_thermal_temp"]
+        ):
+            return False
+        if (
+            latest["battery_temperature"] is not None
+            and latest["battery_temperature"] > bands["max_battery_temp"]
+        ):
+            return False
+        recent = history[-bands["stable_samples"] :]
+        if len(recent) < bands["stable_samples"]:
+            return False
+        for key in ("max_thermal_temp", "battery_temperature"):
+            values = [r[key] for r in recent if r[key] is not None]
+            if values and max(values) - min(values) > bands["stable_delta"]:
+                return False
+        return True
+
+    def _record(self, start, history, ready, adaptive):
+        first = history[0]
+        latest = history[-1]
+        return {
+            "cooldown_time": round(time.monotonic() - start, 3),
+            "cooldown_ready": ready,
+            "cooldown_adaptive": adaptive,
+            "cooldown_start_max_thermal_temp": first["max_thermal_temp"],
+            "cooldown_start_battery_temp": first["battery_temperature"],
+            "cooldown_max_thermal_temp": latest["max_thermal_temp"],
+            "cooldown_battery_temp": latest["battery_temperature"],
+            "cooldown_charge_level": latest["charge_level"],
+        }
+
+
+def coolDownPlatform(platform, cooldown, args=None) -> dict[str, Any] | None:
+    """Cool a platform down between two runs. With --adaptive_cooldown the
+    readiness gate is used and its record returned, else sleep cooldown seconds."""
+    if args is None or not getattr(args, "adaptive_cooldown", False):
+        time.sleep(cooldown)
+        return None
+    gate = ReadinessGate(
+        platform.platform_hash,
+        args.platform,
+        args.android_dir,
+        max_wait=args.cooldown_max_wait,
+        bands=parseReadinessBands(args.cooldown_bands),
+        fallback_wait=cooldown,
+    )
+    return gate.wait()
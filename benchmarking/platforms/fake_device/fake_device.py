@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+
+# pyre-unsafe
+
+##############################################################################
+# Copyright 2017-present, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+##############################################################################
+
+"""
+Fake adb and ios-deploy executables backed by a local directory, to run the
+harness end to end without devices. The bin/ directory next to this file has
+adb and ios-deploy wrappers, put it first on PATH:
+
+    PATH=platforms/fake_device/bin:$PATH FAKE_DEVICE_ROOT=/tmp/fake_devices ...
+
+Each device is a directory, FAKE_DEVICE_ROOT/android/<serial> or
+FAKE_DEVICE_ROOT/ios/<udid>, created on first use. Device paths under /data,
+/sdcard, /storage, /sys, /system, /vendor and /mnt are mapped into the device
+directory. Shell commands run on the host with small shims for getprop, su,
+am, dumpsys and friends, so only point it at trusted benchmark commands.
+
+Per-command latency is read from FAKE_DEVICE_ROOT/latency.json or the
+FAKE_DEVICE_LATENCY json string, e.g. {"default": 0.01, "push": 0.05,
+"push_per_mb": 0.02}. Every call is appended to FAKE_DEVICE_ROOT/commands.jsonl.
+"""
+
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import time
+
+DEFAULT_ROOT = os.path.join("/tmp", "fake_devices")
+DEFAULT_ANDROID_SERIAL = "fake0"
+DEFAULT_IOS_UDID = "0000fake0000"
+MAPPED_PREFIXES = (
+    "/data",
+    "/sdcard",
+    "/storage",
+    "/sys",
+    "/system",
+    "/vendor",
+    "/mnt",
+)
+
+DEFAULT_PROPS = {
+    "ro.product.model": "FakePhone",
+    "ro.build.version.release": "13",
+    "ro.build.version.sdk": "33",
+    "ro.build.version.incremental": "fake",
+    "ro.product.cpu.abi": "arm64-v8a",
+    "fake.root": "1",
+    "fake.battery.level": "80",
+    "fake.battery.temperature": "300",
+}
+DEFAULT_IOS_DEVICE = {
+    "model": "iPhone12",
+    "name": "iPhone 12",
+    "abi": "arm64e",
+    "os_version": "16.0",
+}
+
+SHIMS = {
+    "getprop": """#!/bin/sh
+if [ -z "$1" ]; then
+  sed 's/^\\([^=]*\\)=\\(.*\\)$/[\\1]: [\\2]/' "$FAKE_DEVICE_DIR/build.prop"
+else
+  grep "^$1=" "$FAKE_DEVICE_DIR/build.prop" | tail -n 1 | cut -d= -f2-
+fi
+""",
+    "setprop": """#!/bin/sh
+grep -v "^$1=" "$FAKE_DEVICE_DIR/build.prop" > "$FAKE_DEVICE_DIR/build.prop.tmp"
+echo "$1=$2" >> "$FAKE_DEVICE_DIR/build.prop.tmp"
+mv "$FAKE_DEVICE_DIR/build.prop.tmp" "$FAKE_DEVICE_DIR/build.prop"
+""",
+    "su": """#!/bin/sh
+case "$1" in
+  -c) shift ;;
+  0|root) shift ;;
+esac
+exec sh -c "$*"
+""",
+    "whoami": """#!/bin/sh
+if [ "$(getprop fake.root)" = "1" ]; then echo root; else echo shell; fi
+""",
+    "id": """#!/bin/sh
+if [ "$(getprop fake.root)" = "1" ]; then echo 0; else echo 2000; fi
+""",
+    "taskset": """#!/bin/sh
+shift
+exec "$@"
+""",
+    "dumpsys": """#!/bin/sh
+if [ "$1" = "battery" ]; then
+  echo "Current Battery Service state:"
+  echo "  level: $(getprop fake.battery.level)"
+  echo "  temperature: $(getprop fake.battery.temperature)"
+fi
+""",
+    "am": """#!/bin/sh
+echo "Status: ok"
+""",
+    "pm": "#!/bin/sh\n",
+    "input": "#!/bin/sh\n",
+    "settings": "#!/bin/sh\n",
+    "logcat": "#!/bin/sh\n",
+}
+
+
+def getRoot():
+    return os.environ.get("FAKE_DEVICE_ROOT", DEFAULT_ROOT)
+
+
+def getLatency(command, size=0):
+    """Emulated latency of a command in seconds."""
+    config = os.environ.get("FAKE_DEVICE_LATENCY")
+    if config:
+        latency = json.loads(config)
+    else:
+        path = os.path.join(getRoot(), "latency.json")
+        latency = {}
+        if os.path.isfile(path):
+            with open(path) as f:
+                latency = json.load(f)
+    delay = latency.get(command, latency.get("default", 0.0))
+    if size:
+        delay += latency.get(command + "_per_mb", 0.0) * size / (1 << 20)
+    return delay
+
+
+def logCommand(tool, command, args, start, latency, status):
+    root = getRoot()
+    os.makedirs(root, exist_ok=True)
+    entry = {
+        "tool": tool,
+        "cmd": command,
+        "args": args,
+        "latency": latency,
+        "elapsed": round(time.time() - start, 6),
+        "status": status,
+    }
+    with open(os.path.join(root, "commands.jsonl"), "a") as f:
+        f.write(json.dumps(entry) + "\n")
+
+
+def _treeSize(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for filename in filenames:
+            total += os.path.getsize(os.path.join(dirpath, filename))
+    return total
+
+
+def _copy(src, tgt):
+    if os.path.isdir(src):
+        if os.path.isdir(tgt):
+            tgt = os.path.join(tgt, os.path.basename(os.path.normpath(src)))
+        shutil.copytree(src, tgt, dirs_exist_ok=True)
+    else:
+        if tgt.endswith("/") or os.path.isdir(tgt):
+            os.makedirs(tgt, exist_ok=True)
+            tgt = os.path.join(tgt, os.path.basename(src))
+        os.makedirs(os.path.dirname(tgt) or ".", exist_ok=True)
+        shutil.copy2(src, tgt)
+
+
+class FakeAdb:
+    def __init__(self, argv):
+        self.argv = list(argv)
+        self.serial = os.environ.get("ANDROID_SERIAL")
+        if len(self.argv) >= 2 and self.argv[0] == "-s":
+            self.serial = self.argv[1]
+            self.argv = self.argv[2:]
+        self.android_root = os.path.join(getRoot(), "android")
+
+    def run(self):
+        start = time.time()
+        command = self.argv[0] if self.argv else ""
+        args = self.argv[1:]
+        handler = getattr(self, "_" + command.replace("-", "_"), None)
+        if handler is None:
+            sys.stderr.write(f"fake adb: unsupported command {command}\n")
+            logCommand("adb", command, args, start, 0, 1)
+            return 1
+        latency, status = handler(args)
+        remaining = latency - (time.time() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+        logCommand("adb", command, args, start, latency, status)
+        return status
+
+    def _getSerials(self):
+        if not os.path.isdir(self.android_root):
+            return []
+        return sorted(
+            d
+            for d in os.listdir(self.android_root)
+            if os.path.isdir(os.path.join(self.android_root, d))
+        )
+
+    def _getDeviceDir(self):
+        serial = self.serial
+        if serial is None:
+            serials = self._getSerials()
+            serial = serials[0] if serials else DEFAULT_ANDROID_SERIAL
+        device_dir = os.path.join(self.android_root, serial)
+        if not os.path.isdir(device_dir):
+            self._createDevice(device_dir)
+        return device_dir
+
+    def _createDevice(self, device_dir):
+        os.makedirs(os.path.join(device_dir, "data", "local", "tmp"), exist_ok=True)
+        os.makedirs(os.path.join(device_dir, "sdcard"), exist_ok=True)
+        zone = os.path.join(device_dir, "sys", "class", "thermal", "thermal_zone0")
+        os.makedirs(zone, exist_ok=True)
+        with open(os.path.join(zone, "type"), "w") as f:
+            f.write("cpu\n")
+        with open(os.path.join(zone, "temp"), "w") as f:
+            f.write("35000\n")
+        with open(os.path.join(device_dir, "build.prop"), "w") as f:
+            for key, value in DEFAULT_PROPS.items():
+                f.write(f"{key}={value}\n")
+        open(os.path.join(device_dir, "logcat.txt"), "w").close()
+
+    def _getShimDir(self):
+        shim_dir = os.path.join(getRoot(), "shims")
+        if not os.path.isdir(shim_dir):
+            os.makedirs(shim_dir + ".tmp", exist_ok=True)
+            for name, content in SHIMS.items():
+                path = os.path.join(shim_dir + ".tmp", name)
+                with open(path, "w") as f:
+                    f.write(content)
+                os.chmod(path, 0o755)
+            try:
+                os.rename(shim_dir + ".tmp", shim_dir)
+            except OSError:
+                # another fake adb created it concurrently
+                shutil.rmtree(shim_dir + ".tmp", True)
+        return shim_dir
+
+    def _mapPath(self, path):
+        device_dir = self._getDeviceDir()
+        for prefix in MAPPED_PREFIXES:
+            if path == prefix or path.startswith(prefix + "/"):
+                return device_dir + path
+        return path
+
+    def _mapCommand(self, cmd):
+        device_dir = self._getDeviceDir()
+        pattern = r"(?<![\w./-])({})(?=/|\s|$|['\";])".format(
+            "|".join(re.escape(p) for p in MAPPED_PREFIXES)
+        )
+        return re.sub(pattern, lambda m: device_dir + m.group(1), cmd)
+
+    def _readProps(self):
+        props = {}
+        with open(os.path.join(self._getDeviceDir(), "build.prop")) as f:
+            for line in f:
+                key, _, value = line.rstrip("\n").partition("=")
+                props[key] = value
+        return props
+
+    def _devices(self, args):
+        serials = self._getSerials() or [DEFAULT_ANDROID_SERIAL]
+        print("List of devices attached")
+        for idx, serial in enumerate(serials):
+            self.serial = serial
+            if "-l" in args:
+                model = self._readProps().get("ro.product.model", "FakePhone")
+                print(
+                    f"{serial}               device product:fake "
+                    f"model:{model} device:fake transport_id:{idx + 1}"
+                )
+            else:
+                print(f"{serial}\tdevice")
+        print("")
+        return getLatency("devices"), 0
+
+    def _push(self, args):
+        if len(args) < 2:
+            sys.stderr.write("adb: push requires an argument\n")
+            return 0, 1
+        srcs, tgt = args[:-1], self._mapPath(args[-1])
+        size = 0
+        for src in srcs:
+            if not os.path.exists(src):
+                sys.stderr.write(
+                    f"adb: error: cannot stat '{src}': No such file or directory\n"
+                )
+                return getLatency("push"), 1
+            _copy(src, tgt)
+            size += _treeSize(src)
+        print(f"{len(srcs)} file pushed, 0 skipped. ({size} bytes)")
+        return getLatency("push", size), 0
+
+    def _pull(self, args):
+        if len(args) < 1:
+            sys.stderr.write("adb: pull requires an argument\n")
+            return 0, 1
+        src = self._mapPath(args[0])
+        tgt = args[1] if len(args) > 1 else "."
+        if not os.path.exists(src):
+            sys.stderr.write(
+                f"adb: error: failed to stat remote object '{args[0]}': "
+                "No such file or directory\n"
+            )
+            return getLatency("pull"), 1
+        _copy(src, tgt)
+        size = _treeSize(src)
+        print(f"{args[0]}: 1 file pulled, 0 skipped. ({size} bytes)")
+        return getLatency("pull", size), 0
+
+    def _shell(self, args):
+        if not args:
+            sys.stderr.write("fake adb: interactive shell is not supported\n")
+            return 0, 1
+        if args[0] == "getprop":
+            props = self._readProps()
+            if len(args) > 1:
+                print(props.get(args[1], ""))
+            else:
+                for key, value in props.items():
+                    print(f"[{key}]: [{value}]")
+            return getLatency("getprop"), 0
+        device_dir = self._getDeviceDir()
+        env = dict(os.environ)
+        env["FAKE_DEVICE_DIR"] = device_dir
+        env["PATH"] = self._getShimDir() + os.pathsep + env.get("PATH", "")
+        sys.stdout.flush()
+        status = subprocess.call(
+            ["sh", "-c", self._mapCommand(" ".join(args))],
+            cwd=device_dir,
+            env=env,
+        )
+        return getLatency("shell"), status
+
+    def _logcat(self, args):
+        logcat = os.path.join(self._getDeviceDir(), "logcat.txt")
+        if "-c" in args:
+            open(logcat, "w").close()
+        elif "-G" in args or "-g" in args:
+            print("ring buffer is 256 KiB")
+        else:
+            # the log is dumped, a fake device never produces new lines
+            with open(logcat) as f:
+                sys.stdout.write(f.read())
+        return getLatency("logcat"), 0
+
+    def _install(self, args):
+        apks = [a for a in args if not a.startswith("-")]
+        app_dir = os.path.join(self._getDeviceDir(), "data", "app")
+        for apk in apks:
+            _copy(apk, app_dir + "/")
+        print("Success")
+        return getLatency("install", sum(_treeSize(a) for a in apks)), 0
+
+    def _uninstall(self, args):
+        print("Success")
+        return getLatency("uninstall"), 0
+
+    def _root(self, args):
+        if self._readProps().get("fake.root") == "1":
+            print("adbd is already running as root")
+            return getLatency("root"), 0
+        print("adbd cannot run as root in production builds")
+        return getLatency("root"), 1
+
+    def _unroot(self, args):
+        print("restarting adbd as non root")
+        return getLatency("unroot"), 0
+
+    def _get_state(self, args):
+        self._getDeviceDir()
+        print("device")
+        return getLatency("get-state"), 0
+
+    def _noop(self, args):
+        return getLatency("default"), 0
+
+    _reboot = _noop
+    _wait_for_device = _noop
+    _kill_server = _noop
+    _start_server = _noop
+    _forward = _noop
+    _reverse = _noop
+
+
+class FakeIOSDeploy:
+    def __init__(self, argv):
+        self.argv = list(argv)
+        self.ios_root = os.path.join(getRoot(), "ios")
+
+    def run(self):
+        start = time.time()
+        opts = self._parse()
+        udid = opts.get("id")
+        if "detect" in opts:
+            command, (latency, status) = "detect", self._detect()
+        elif "get_battery_level" in opts:
+            command, (latency, status) = "battery", self._battery(udid)
+        elif "upload" in opts:
+            command, (latency, status) = "upload", self._upload(udid, opts)
+        elif "download" in opts:
+            command, (latency, status) = "download", self._download(udid, opts)
+        elif "bundle" in opts:
+            command, (latency, status) = "launch", self._launch(udid, opts)
+        else:
+            sys.stderr.write(f"fake ios-deploy: unsupported arguments {self.argv}\n")
+            logCommand("ios-deploy", "", self.argv, start, 0, 1)
+            return 1
+        remaining = latency - (time.time() - start)
+        if remaining > 0:
+            time.sleep(remaining)
+        logCommand("ios-deploy", command, self.argv, start, latency, status)
+        return status
+
+    def _parse(self):
+        opts = {}
+        idx = 0
+        with_value = ("id", "bundle_id", "bundle", "upload", "to", "args", "timeout")
+        while idx < len(self.argv):
+            arg = self.argv[idx]
+            if arg.startswith("--"):
+                key = arg[2:]
+                if key in with_value and idx + 1 < len(self.argv):
+                    opts[key] = self.argv[idx + 1]
+                    idx += 1
+                else:
+                    opts[key] = True
+            idx += 1
+        return opts
+
+    def _getDeviceDir(self, udid):
+        if udid is None:
+            udids = self._getUdids()
+            udid = udids[0] if udids else DEFAULT_IOS_UDID
+        device_dir = os.path.join(self.ios_root, udid)
+        if not os.path.isdir(device_dir):
+            os.makedirs(os.path.join(device_dir, "app_data"), exist_ok=True)
+            with open(os.path.join(device_dir, "device.json"), "w") as f:
+                json.dump(DEFAULT_IOS_DEVICE, f)
+        return device_dir
+
+    def _getUdids(self):
+        if not os.path.isdir(self.ios_root):
+            return []
+        return sorted(
+            d
+            for d in os.listdir(self.ios_root)
+            if os.path.isdir(os.path.join(self.ios_root, d))
+        )
+
+    def _detect(self):
+        print("[....] Waiting up to 1 seconds for iOS device to be connected")
+        for udid in self._getUdids() or [DEFAULT_IOS_UDID]:
+            with open(os.path.join(self._getDeviceDir(udid), "device.json")) as f:
+                device = json.load(f)
+            print(
+                "[....] Found {} ({}, {}, iphoneos, {}, {}, fake) a.k.a. "
+                "'Fake {}' connected through USB.".format(
+                    udid,
+                    device["model"],
+                    device["name"],
+                    device["abi"],
+                    device["os_version"],
+                    device["name"],
+                )
+            )
+        return getLatency("detect"), 0
+
+    def _battery(self, udid):
+        self._getDeviceDir(udid)
+        print("BatteryCurrentCapacity:80")
+        return getLatency("battery"), 0
+
+    def _upload(self, udid, opts):
+        src = opts["upload"]
+        tgt = os.path.join(
+            self._getDeviceDir(udid), "app_data", opts.get("to", "").lstrip("/")
+        )
+        if not os.path.exists(src):
+            sys.stderr.write(f"fake ios-deploy: {src} does not exist\n")
+            return getLatency("upload"), 1
+        _copy(src, tgt)
+        return getLatency("upload", _treeSize(src)), 0
+
+    def _download(self, udid, opts):
+        app_data = os.path.join(self._getDeviceDir(udid), "app_data")
+        tgt = opts.get("to", ".")
+        os.makedirs(tgt, exist_ok=True)
+        shutil.copytree(app_data, tgt, dirs_exist_ok=True)
+        return getLatency("download", _treeSize(app_data)), 0
+
+    def _launch(self, udid, opts):
+        device_dir = self._getDeviceDir(udid)
+        if "uninstall" in opts:
+            return getLatency("uninstall"), 0
+        app = opts["bundle"]
+        main = os.path.join(app, "fake_main")
+        args = opts.get("args", "")
+        if os.path.isfile(main) and os.access(main, os.X_OK):
+            sys.stdout.flush()
+            status = subprocess.call(
+                [main] + args.split(), cwd=os.path.join(device_dir, "app_data")
+            )
+        else:
+            print(f"fake ios-deploy: launched {app} {args}")
+            status = 0
+        return getLatency("launch"), status
+
+
+TOOLS = {
+    "adb": FakeAdb,
+    "ios-deploy": FakeIOSDeploy,
+}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in TOOLS:
+        sys.stderr.write("usage: fake_device.py {adb|ios-deploy} [args]\n")
+        return 2
+    return TOOLS[sys.argv[1]](sys.argv[2:]).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -121,6 +121,15 @@ class PlatformBase:
     def rebootDevice(self):
         pass
 
+    def resetForJob(self, tempdir, args):
+        """Reuse a platform object cached by a warm lab worker for a new job.
+        Only per-job state is reset, the device properties are kept."""
+        self.tempdir = tempdir
+        self.util.tempdir = tempdir
+        if hasattr(self, "args"):
+            self.args = args
+        self.app = None
+
     @abc.abstractmethod
     def runBenchmark(self, cmd, *args, **kwargs):
         return None, None
@@ -8,7 +8,12 @@
 
 # pyre-unsafe
 
+import hashlib
 import logging
+import os
+import shlex
+import subprocess
+import tempfile
 import threading
 import time
 
@@ -22,9 +27,158 @@ class ThermalException(Exception):
     pass
 
 
-# This class runs a thread which periodically executes the thermal monitor
-# script on device. If the script return output indicating the script
-# killed a benchmark it will call setRunKilled and log output
+THERMAL_DAEMON_DST = "/data/local/tmp/thermal_daemon.sh"
+DEFAULT_STREAM_INTERVAL = 1.0
+
+# Prints the trip temperature once, then one line per reading: the uptime in
+# seconds and the raw value of the probe. The arguments are the probe, the
+# trip temperature expression, which may use shell substitutions, and the
+# interval in seconds. The loop ends with the adb session, on the first
+# write to the closed pipe.
+THERMAL_DAEMON_SCRIPT = """\
+eval "trip=$2"
+echo "trip $trip"
+while true; do
+  read up idle < /proc/uptime
+  read temp < "$1"
+  echo "$up $temp"
+  sleep "$3"
+done
+"""
+
+
+def _pushIfChanged(adb, src, dst):
+    """Push src to dst unless the md5 recorded next to dst matches it.
+    Return True if the file was pushed."""
+    with open(src, "rb") as f:
+        digest = hashlib.md5(f.read()).hexdigest()
+    hash_file = dst + ".md5"
+    deployed = adb.shell(
+        ["cat", hash_file], silent=True, ignore_status=True, default=[]
+    )
+    if deployed and deployed[0].strip() == digest:
+        return False
+    adb.push(src, dst)
+    adb.shell(["echo", digest, ">", hash_file], silent=True)
+    return True
+
+
+class ThermalStream:
+    """
+    Streams the readings of a thermal probe from a loop running on the
+    device over the stdout of a single adb shell, instead of one adb call
+    per reading. Readings are kept for the lifetime of the stream and
+    listeners are called with (time, temp) for each new reading.
+    """
+
+    def __init__(self, adb: ADB, temp_probe: str, trip_temp_expr: str, interval):
+        self.adb = adb
+        self.temp_probe = temp_probe
+        self.trip_temp_expr = trip_temp_expr
+        self.interval = interval
+        self.trip_temp = None
+        self.times = []
+        self.temps = []
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.process = None
+        self.reader = None
+
+    def start(self):
+        with tempfile.NamedTemporaryFile(
+            mode="w", delete=False, prefix="thermal_daemon_", suffix=".sh"
+        ) as f:
+            f.write(THERMAL_DAEMON_SCRIPT)
+        try:
+            _pushIfChanged(self.adb, f.name, THERMAL_DAEMON_DST)
+        finally:
+            os.unlink(f.name)
+        cmd = self.adb._addADB() + [
+            "shell",
+            "sh",
+            THERMAL_DAEMON_DST,
+            shlex.quote(self.temp_probe),
+            shlex.quote(self.trip_temp_expr),
+            str(self.interval),
+        ]
+        self.process = subprocess.Popen(
+            cmd,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            universal_newlines=True,
+            bufsize=1,
+        )
+        self.reader = threading.Thread(target=self._read, daemon=True)
+        self.reader.start()
+
+    def stop(self):
+        if self.process is None:
+            return
+        if self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=5.0)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        self.reader.join(timeout=5.0)
+        self.process = None
+
+    def isRunning(self):
+        return self.process is not None and self.process.poll() is None
+
+    def addListener(self, listener):
+        with self.lock:
+            self.listeners.append(listener)
+
+    def removeListener(self, listener):
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def getReadings(self, start=0):
+        """Readings from index start on, as {"times", "temps", "trip_temp"}."""
+        with self.lock:
+            return {
+                "probe": self.temp_probe,
+                "trip_temp": self.trip_temp,
+                "times": self.times[start:],
+                "temps": self.temps[start:],
+            }
+
+    def numReadings(self):
+        with self.lock:
+            return len(self.times)
+
+    def _read(self):
+        for line in self.process.stdout:
+            fields = line.split()
+            if len(fields) != 2:
+                continue
+            try:
+                if fields[0] == "trip":
+                    with self.lock:
+                        self.trip_temp = float(fields[1])
+                    continue
+                reading = (float(fields[0]), float(fields[1]))
+            except ValueError:
+                continue
+            with self.lock:
+                self.times.append(reading[0])
+                self.temps.append(reading[1])
+                listeners = list(self.listeners)
+            for listener in listeners:
+                try:
+                    listener(*reading)
+                except Exception:
+                    getLogger().exception("Thermal stream listener failed.")
+
+
+# This class watches the temperature of the device while a benchmark runs.
+# In the default stream mode the readings come from a ThermalStream, which
+# is shared by all runs of a job when one is passed in. In poll mode a thread
+# periodically executes the thermal monitor script on device. If the trip
+# temperature is reached it will call setRunKilled and log output
 # to the benchmark.
 class ThermalMonitor:
     def __init__(
@@ -35,30 +189,43 @@ class ThermalMonitor:
         pattern: str,
         delay: float = 10.0,
         lead_in_delay: float = 15.0,
+        stream: ThermalStream = None,
     ):
         """
         If thermal monitoring is specified for a device, load the config.
         Config must be in the form
         <platform.model>: {
-            'script': <path to script to run>
+            'mode': <"stream" (default) or "poll">
+            'script': <path to script to run, poll mode only>
             'trip_temp_expr': <an expression evaluated to trip temp>
             'temp_probe': <the file which will be polled to monitor temperature>
+            'interval': <seconds between readings, stream mode only>
         }
-        Script will be pushed to the platform and run every delay seconds.
+        In poll mode the script will be pushed to the platform and run every
+        delay seconds.
         pattern: string - pattern of program to match
         lead_in_delay: int - delay before starting monitoring loop
+        stream: ThermalStream - readings shared across runs, stream mode only
         """
         self.log_handle = log_handle
         self.thermal_monitor_config = thermal_monitor_config
         self.adb = adb
         self.initialized = False
         self.thermal_monitor_script_dst = "/data/local/tmp/thermal_monitor.sh"
+        self.stream = stream
+        self.own_stream = False
+        self.readings = None
         if thermal_monitor_config:
             try:
                 self.log(f"Thermal config found for device {adb.device}.")
+                self.mode = self.thermal_monitor_config.get("mode", "stream")
                 self.trip_temp_expr = self.thermal_monitor_config["trip_temp_expr"]
                 self.temp_probe = self.thermal_monitor_config["temp_probe"]
-                self.push_thermal_script()
+                if self.mode == "poll":
+                    self.push_thermal_script()
+                elif self.stream is None:
+                    self.stream = createThermalStream(adb, thermal_monitor_config)
+                    self.own_stream = True
                 self.initialized = True
             except Exception:
                 self.log(
@@ -76,10 +243,14 @@ class ThermalMonitor:
         )
         self.monitor = None
         self.running = False
+        self.tripped = False
+        self.stream_start = 0
 
     # Start thermal monitoring loop which will run the script each delay seconds.
     def __enter__(self):
-        if self.initialized:
+        if self.initialized and self.mode != "poll":
+            self.start_thermal_stream()
+        elif self.initialized:
             self.running = True
             self.monitor = threading.Thread(target=self.start_thermal_monitoring)
             self.monitor.start()
@@ -88,7 +259,9 @@ class ThermalMonitor:
             )
 
     def __exit__(self, type, value, traceback):
-        if self.initialized:
+        if self.initialized and self.mode != "poll":
+            self.stop_thermal_stream()
+        elif self.initialized:
             if self.running is True:
                 self.running = False
             self.monitor.join(timeout=5.0)
@@ -98,15 +271,67 @@ class ThermalMonitor:
     def thermal_stop_action(self):
         setRunKilled(True)
 
-    # Push thermal monitoring script to the device.
+    # Push thermal monitoring script to the device, unless the same script is there.
     def push_thermal_script(self):
         thermal_monitor_script = self.thermal_monitor_config.get("script")
         thermal_monitor_script_loc = pkg_resources.resource_filename(
             "aibench", thermal_monitor_script
         )
 
-        self.adb.push(thermal_monitor_script_loc, self.thermal_monitor_script_dst)
-        self.adb.shell(["chmod", "+x", self.thermal_monitor_script_dst], silent=True)
+        if _pushIfChanged(
+            self.adb, thermal_monitor_script_loc, self.thermal_monitor_script_dst
+        ):
+            self.adb.shell(
+                ["chmod", "+x", self.thermal_monitor_script_dst], silent=True
+            )
+
+    # Watch the readings of the stream from now on, starting it if needed.
+    def start_thermal_stream(self):
+        try:
+            if not self.stream.isRunning():
+                self.stream.start()
+        except Exception:
+            self.log(
+                f"WARNING! Thermal stream could not be started for device {self.adb.device}.",
+                logging.CRITICAL,
+                exc_info=True,
+            )
+            return
+        self.stream_start = self.stream.numReadings()
+        self.stream.addListener(self.check_reading)
+        self.log(
+            f"Thermal stream started. {self.trip_temp_expr=} {self.temp_probe=} {self.pattern=}"
+        )
+
+    # Keep the readings of this run, the stream keeps running if it is shared.
+    def stop_thermal_stream(self):
+        self.stream.removeListener(self.check_reading)
+        self.readings = self.stream.getReadings(self.stream_start)
+        if self.own_stream:
+            self.stream.stop()
+        temps = self.readings["temps"]
+        if temps:
+            self.log(
+                f"{len(temps)} readings, max {max(temps)}, trip {self.readings['trip_temp']}."
+            )
+        self.log("Exiting thermal monitor.")
+
+    # Called by the stream for each reading, stops the benchmark once at the trip temperature.
+    def check_reading(self, uptime, temp):
+        trip_temp = self.stream.trip_temp
+        if self.tripped or trip_temp is None or temp < trip_temp:
+            return
+        self.tripped = True
+        self.log(
+            f"{self.thermal_trip_pattern} {temp=} {trip_temp=} at {uptime}s uptime."
+            "\n\n## CRITICAL TEMPERATURE REACHED ON DEVICE! PROCESSES HAVE BEEN SHUT DOWN. ##\n\n"
+        )
+        program = os.path.basename(self.pattern.split(" ")[0])
+        if program:
+            self.adb.shell(
+                ["pkill", "-f", shlex.quote(program)], silent=True, ignore_status=True
+            )
+        self.thermal_stop_action()
 
     # Main loop for the monitoring thread. Sets environment variables and runs thermal monitoring script.
     def start_thermal_monitoring(self):
@@ -145,3 +370,15 @@ class ThermalMonitor:
             exc_info=exc_info,
         )
         self.log_handle += ["Thermal monitoring:\t" + string for string in msg]
+
+
+def createThermalStream(adb: ADB, thermal_monitor_config: dict[str, str]):
+    """A stream for the config, or None if it is not in stream mode."""
+    if not thermal_monitor_config or thermal_monitor_config.get("mode") == "poll":
+        return None
+    return ThermalStream(
+        adb,
+        thermal_monitor_config["temp_probe"],
+        thermal_monitor_config["trip_temp_expr"],
+        thermal_monitor_config.get("interval", DEFAULT_STREAM_INTERVAL),
+    )
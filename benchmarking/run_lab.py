@@ -22,6 +22,7 @@ import signal
 import stat
 import tempfile
 import time
+from collections import defaultdict
 from concurrent.futures import ProcessPoolExecutor as Pool
 from io import StringIO
 
@@ -29,10 +30,20 @@ from bridge.db import DBDriver
 from bridge.file_storages import UploadDownloadFiles
 from download_benchmarks.download_benchmarks import DownloadBenchmarks
 from harness import BenchmarkDriver
+from metrics.exporter import (
+    getMetricsRegistry,
+    JOB_LATENCY_BUCKETS,
+    serveMetrics,
+)
+from metrics.histograms import LatencyHistogram
 from platforms.android.adb import ADB
+from platforms.device_readiness import (
+    DEFAULT_COOLDOWN_MAX_WAIT as default_cooldown_max_wait,
+)
 from platforms.device_manager import (
     CoolDownDevice,
     DEFAULT_DM_INTERVAL as default_dm_interval,
+    DEFAULT_DM_TASK_TIMEOUT as default_dm_task_timeout,
     DeviceManager,
     getDevicesString,
     MINIMUM_DM_INTERVAL as minimum_dm_interval,
@@ -40,6 +51,19 @@ from platforms.device_manager import (
 )
 from utils.check_argparse import claimer_id_type
 from utils.custom_logger import getLogger, setLoggerLevel
+from utils.device_affinity import (
+    DEFAULT_AFFINITY_MAX_DEFER as default_affinity_max_defer,
+    DeviceAffinity,
+)
+from utils.device_workers import (
+    DeviceWorkerPool,
+    getWorkerPlatformCache,
+    jainFairness,
+)
+from utils.kill_watcher import (
+    DEFAULT_KILL_POLL_INTERVAL as default_kill_poll_interval,
+    KillRequestWatcher,
+)
 from utils.log_update_handler import DBLogUpdateHandler
 from utils.log_utils import (
     collectLogData,
@@ -47,11 +71,14 @@ from utils.log_utils import (
     trimLog,
     valid_interval,
 )
+from utils.tracing import startTrace, stopTrace, traceSpan
 from utils.utilities import (
     BenchmarkArgParseException,
+    configureHttpPool,
     DownloadException,
     DownloadNotFoundException,
     getFilename,
+    getHttpConnectionStats,
     getMachineId,
     HARNESS_ERROR_FLAG as HARNESS_ERROR,
     KILLED_FLAG as RUN_KILLED,
@@ -87,6 +114,24 @@ parser.add_argument(
     type=float,
     help="Specify the time interval between two test runs.",
 )
+parser.add_argument(
+    "--adaptive_cooldown",
+    action="store_true",
+    help="Instead of sleeping for the cooldown time, hold each device until "
+    "its thermal zones, battery temperature and charge are stable within "
+    "the bands given by --cooldown_bands, up to --cooldown_max_wait seconds.",
+)
+parser.add_argument(
+    "--cooldown_bands",
+    help="A json string overriding the default adaptive cooldown bands, e.g. "
+    '{"max_thermal_temp": 45, "max_battery_temp": 38, "min_charge_level": 30}',
+)
+parser.add_argument(
+    "--cooldown_max_wait",
+    default=default_cooldown_max_wait,
+    type=float,
+    help="Maximum time in seconds a device is held by the adaptive cooldown.",
+)
 parser.add_argument(
     "-d",
     "--devices",
@@ -160,11 +205,68 @@ parser.add_argument(
         minimum_dm_interval, default_dm_interval
     ),
 )
+parser.add_argument(
+    "--device_monitor_timeout",
+    type=float,
+    default=default_dm_task_timeout,
+    help="Timeout in seconds of each device monitoring task, e.g. device "
+    "discovery, heartbeats and counter updates. Default {}s.".format(
+        default_dm_task_timeout
+    ),
+)
+parser.add_argument(
+    "--kill_poll_interval",
+    type=float,
+    default=default_kill_poll_interval,
+    help="Interval in seconds at which the status of all running jobs of the "
+    "host is queried for user kill requests. Default {}s.".format(
+        default_kill_poll_interval
+    ),
+)
+parser.add_argument(
+    "--affinity_max_defer",
+    type=float,
+    default=default_affinity_max_defer,
+    help="Jobs prefer the free devices that already hold their program and "
+    "models. If only a busy device holds them, the job is sent back to the "
+    "queue for at most this many seconds to wait for it. 0 never defers jobs.",
+)
+parser.add_argument(
+    "--device_workers",
+    action="store_true",
+    help="Run the jobs of each device in its own long-lived worker process "
+    "that keeps the benchmark modules imported and the platform object of "
+    "the device cached, instead of a process pool shared by all devices.",
+)
+parser.add_argument(
+    "--http_pool_maxsize",
+    default=16,
+    type=int,
+    help="Maximum number of keep-alive connections kept per host by the "
+    "pooled HTTP sessions.",
+)
+parser.add_argument(
+    "--compress_requests",
+    action="store_true",
+    help="Gzip large request bodies sent to the server. The server must "
+    "accept Content-Encoding: gzip.",
+)
 parser.add_argument(
     "--device_counters",
     action="store_true",
     help="Post device counter information from device monitor.",
 )
+parser.add_argument(
+    "--metrics_port",
+    type=int,
+    help="Serve the counters, gauges and latency histograms of the lab in "
+    "the Prometheus text format at http://<metrics_host>:<port>/metrics.",
+)
+parser.add_argument(
+    "--metrics_host",
+    default="127.0.0.1",
+    help="The address the metrics endpoint listens on.",
+)
 parser.add_argument(
     "--shared_libs",
     help="Pass the shared libs that the framework depends on, "
@@ -221,6 +323,9 @@ parser.add_argument(
 )
 
 LOCK = multiprocessing.Lock()
+KILL_EVENT_CHECK_INTERVAL = 1.0
+# Report the device affinity and job startup stats every this many jobs.
+STATS_REPORT_JOBS = 20
 
 DRAIN = False
 RUNNING_JOBS = 0
@@ -253,7 +358,15 @@ def stopRun(args):
 
 class runAsync:
     def __init__(
-        self, args, device, db, job, benchmark_downloader, file_storage, usb_controller
+        self,
+        args,
+        device,
+        db,
+        job,
+        benchmark_downloader,
+        file_storage,
+        usb_controller,
+        kill_event=None,
     ):
         self.args = args
         self.device = device
@@ -265,11 +378,15 @@ class runAsync:
         self.benchmark_downloader = benchmark_downloader
         self.file_storage = file_storage
         self.usb_controller = usb_controller
+        # set by the host's KillRequestWatcher when the user kills the job
+        self.kill_event = kill_event
+        self.submit_time = time.time()
 
     def __call__(self):
         return self.run()
 
     def run(self):
+        startup_latency = time.time() - self.submit_time
         # set env vars of this process and any subprocess for logging.
         os.environ["JOB_IDENTIFIER"] = str(self.job["identifier"])
         os.environ["JOB_ID"] = str(self.job["id"])
@@ -292,19 +409,27 @@ class runAsync:
                     self.args.rt_logging_interval
                 )
             )
+        tracer = startTrace()
         try:
-            self._setFramework()
-            with LOCK:
-                getLogger().info(
-                    f"Lock acquired by {os.getpid()} before _downloadFiles() for benchmark {self.job['identifier']} id ({self.job['id']})"
+            with tracer.span(
+                "runAsync.run", identifier=self.job["identifier"], id=self.job["id"]
+            ):
+                self._setFramework()
+                with traceSpan("download"), LOCK:
+                    getLogger().info(
+                        f"Lock acquired by {os.getpid()} before _downloadFiles() for benchmark {self.job['identifier']} id ({self.job['id']})"
+                    )
+                    self._downloadFiles()
+                raw_args = self._getRawArgs()
+                app = BenchmarkDriver(
+                    raw_args=raw_args,
+                    usb_controller=self.usb_controller,
+                    platform_cache=getWorkerPlatformCache(),
                 )
-                self._downloadFiles()
-            raw_args = self._getRawArgs()
-            app = BenchmarkDriver(raw_args=raw_args, usb_controller=self.usb_controller)
-            getLogger().debug(
-                f"Running BenchmarkDriver for benchmark {self.job['identifier']} id ({self.job['id']})"
-            )
-            status = app.run()
+                getLogger().debug(
+                    f"Running BenchmarkDriver for benchmark {self.job['identifier']} id ({self.job['id']})"
+                )
+                status = app.run()
         except DownloadNotFoundException:
             getLogger().exception(
                 f"A file could not be found when downloading files for benchmark {self.job['identifier']} id ({self.job['id']})"
@@ -335,11 +460,17 @@ class runAsync:
                 getLogger().handlers.remove(handler)
             del handlers
             self._setStatusOutput(status, output)
-            self._submitDone()
+            stopTrace()
+            self._submitDone(tracer)
             self._removeBenchmarkFiles()
             time.sleep(1)
 
-        return {"device": self.device, "job": self.job}
+        return {
+            "device": self.device,
+            "job": self.job,
+            "startup_latency": startup_latency,
+            "phase_times": tracer.summarize(),
+        }
 
     def _setFramework(self):
         """Set framework of job based on benchmark config.  Default to caffe2"""
@@ -431,6 +562,20 @@ class runAsync:
             if self.args.device_name_mapping:
                 raw_args.append("--device_name_mapping")
                 raw_args.append(self.args.device_name_mapping)
+            if self.args.adaptive_cooldown:
+                raw_args.extend(
+                    [
+                        "--adaptive_cooldown",
+                        "--cooldown_max_wait",
+                        str(self.args.cooldown_max_wait),
+                    ]
+                )
+                if self.args.cooldown_bands:
+                    raw_args.extend(["--cooldown_bands", self.args.cooldown_bands])
+            if self.device.get("cooldown"):
+                raw_args.extend(
+                    ["--device_cooldown", json.dumps(self.device["cooldown"])]
+                )
             return raw_args
         except Exception:
             raise BenchmarkArgParseException("Error parsing raw args from job.")
@@ -561,9 +706,9 @@ class runAsync:
             output = trimLog(output)
             self.job["log"] = output
 
-    def _submitDone(self):
+    def _submitDone(self, tracer=None):
         """Collect benchmark data and log, submit to db."""
-        data = self._collectBenchmarkData(self.tempdir)
+        data = self._collectBenchmarkData(self.tempdir, self._uploadTrace(tracer))
         log = collectLogData(self.job)
         self.db.doneBenchmarks(str(self.job["id"]), self.job["status"], data, log)
 
@@ -584,7 +729,20 @@ class runAsync:
         # for model_location in models_location:
         #     shutil.rmtree(os.path.dirname(model_location), True)
 
-    def _collectBenchmarkData(self, output_dir):
+    def _uploadTrace(self, tracer):
+        """Upload the chrome trace of the job, return its link and the
+        seconds spent in each phase."""
+        if tracer is None:
+            return None
+        trace = {"phase_times": tracer.summarize()}
+        try:
+            filename = tracer.save(os.path.join(self.tempdir, "trace.json"))
+            trace["trace"] = self.file_storage.upload(file=filename, permanent=False)
+        except Exception:
+            getLogger().exception("Failed to upload the trace of the job.")
+        return trace
+
+    def _collectBenchmarkData(self, output_dir, trace=None):
         data = {}
         dirs = self._listdirs(output_dir)
         for d in dirs:
@@ -599,6 +757,10 @@ class runAsync:
                 # special case for power metrics
                 if "power_data" in content:
                     content["power_data"] = self._handlePowerData(content["power_data"])
+                if trace and isinstance(content.get("meta"), dict):
+                    content["meta"]["job_phase_times"] = trace["phase_times"]
+                    if "trace" in trace:
+                        content["meta"]["trace"] = trace["trace"]
                 data[d] = content
         return json.dumps(data)
 
@@ -615,6 +777,8 @@ class runAsync:
         return file_link
 
     def didUserRequestJobKill(self):
+        if self.kill_event is not None:
+            return self.kill_event.is_set()
         jobs = self.db.statusBenchmarks(self.job["identifier"])
         for job in jobs:
             if job["status"] == "KILLED":
@@ -629,6 +793,10 @@ class RunLab:
     def __init__(self, raw_args=None):
         self.args, self.unknowns = parser.parse_known_args(raw_args)
         os.environ["CLAIMER"] = self.args.claimer_id
+        configureHttpPool(
+            pool_maxsize=self.args.http_pool_maxsize,
+            compress=self.args.compress_requests,
+        )
         self.benchmark_downloader = DownloadBenchmarks(self.args, getLogger())
         self.file_storage = UploadDownloadFiles(self.args)
         self.adb = ADB(None, self.args.android_dir)
@@ -652,19 +820,62 @@ class RunLab:
         self.device_manager = DeviceManager(self.args, self.db)
         self.devices = self.device_manager.getLabDevices()
 
-        if self.args.platform.startswith("host"):
-            numProcesses = 2
+        if self.args.device_workers:
+            self.pool = DeviceWorkerPool(initializer=hookSignals)
         else:
-            numProcesses = multiprocessing.cpu_count() - 1
-        self.pool = Pool(max_workers=numProcesses, initializer=hookSignals)
+            if self.args.platform.startswith("host"):
+                numProcesses = 2
+            else:
+                numProcesses = multiprocessing.cpu_count() - 1
+            self.pool = Pool(max_workers=numProcesses, initializer=hookSignals)
+        # time from submitting a job to the job starting in its worker
+        self.startup_latency = defaultdict(LatencyHistogram)
+        # kill events are shared with the job processes through a manager
+        self.manager = multiprocessing.Manager()
+        self.kill_watcher = KillRequestWatcher(self.db, self.args.kill_poll_interval)
+        self.affinity = DeviceAffinity(self.args.affinity_max_defer)
+        self.metrics_server = None
+        if self.args.metrics_port is not None:
+            getMetricsRegistry().addCollector(self.collectMetrics)
+            self.metrics_server = serveMetrics(
+                self.args.metrics_port, self.args.metrics_host
+            )
+            getLogger().info(
+                "Serving lab metrics at http://{}:{}/metrics".format(
+                    *self.metrics_server.server_address
+                )
+            )
 
     def run(self):
         hookSignals()
+        self.kill_watcher.start()
         while not stopRun(self.args):
             self._runOnce()
             time.sleep(1)
+        self.kill_watcher.stop()
         self.db.updateDevices(self.args.claimer_id, "", True)
         self.device_manager.shutdown()
+        getLogger().info(f"HTTP connection stats: {getHttpConnectionStats()}")
+        self._reportAffinity()
+        self._reportStartupLatency()
+        if self.args.device_workers:
+            self.pool.shutdown()
+        if self.metrics_server is not None:
+            self.metrics_server.shutdown()
+            self.metrics_server.server_close()
+
+    def collectMetrics(self, registry):
+        registry.setGauge(
+            "aibench_lab_running_jobs",
+            "Jobs submitted to the workers of this lab host and not finished.",
+            RUNNING_JOBS,
+        )
+        stats = self.affinity.getStats()
+        registry.setGauge(
+            "aibench_lab_affinity_hit_rate",
+            "Share of the programs and models already on the assigned device.",
+            stats["hit_rate"],
+        )
 
     def _runOnce(self):
         jobs = self._claimBenchmarks()
@@ -690,6 +901,12 @@ class RunLab:
         jobs = []
         if len(devices) > 0:
             jobs = self.db.claimBenchmarks(claimer_id, devices, hashes)
+        for job in jobs:
+            getMetricsRegistry().incCounter(
+                "aibench_lab_claimed_jobs_total",
+                "Jobs claimed from the job queue.",
+                kind=job["device"],
+            )
         return jobs
 
     def _selectBenchmarks(self, jobs):
@@ -719,19 +936,23 @@ class RunLab:
                     getLogger().info(
                         f"Job {job['id']} requests device {job['device']} with hash {job['hash']}."
                     )
-                    hashes = [job["hash"]]
+                    candidates = {job["hash"]: self.devices[device_kind][job["hash"]]}
                 else:
-                    hashes = self.devices[device_kind]
-                for hash in hashes:
-                    device = self.devices[device_kind][hash]
-                    if device["available"] is True:
-                        getLogger().info(
-                            f"Device {job['device']} with hash {hash} is available for job {job['id']} on server {self.args.claimer_id}."
-                        )
-                        job["hash"] = hash
-                        jobs_queue.append(job)
-                        device["available"] = False
-                        break
+                    candidates = self.devices[device_kind]
+                # prefer the device already holding the program and models
+                hash = self.affinity.selectDevice(job, candidates)
+                if hash is not None:
+                    getLogger().info(
+                        f"Device {job['device']} with hash {hash} is available for job {job['id']} on server {self.args.claimer_id}."
+                    )
+                    job["hash"] = hash
+                    jobs_queue.append(job)
+                    self.devices[device_kind][hash]["available"] = False
+                elif self.affinity.isDeferred(job):
+                    getLogger().info(
+                        f"Job {job['id']} waits for a busy device {job['device']} holding its program and models."
+                    )
+                    remaining_jobs.append(job)
                 else:
                     getLogger().critical(
                         f"The requested device {job['device']} with hash {job.get('hash', '<unspecified>')} is not available on server {self.args.claimer_id}."
@@ -740,6 +961,11 @@ class RunLab:
         return jobs_queue, remaining_jobs
 
     def _releaseBenchmarks(self, remaining_jobs):
+        getMetricsRegistry().incCounter(
+            "aibench_lab_released_jobs_total",
+            "Claimed jobs released back to the job queue.",
+            len(remaining_jobs),
+        )
         # releasing unmatched jobs
         releasing_ids = ",".join([str(job["id"]) for job in remaining_jobs])
         self.db.releaseBenchmarks(self.args.claimer_id, releasing_ids)
@@ -761,6 +987,8 @@ class RunLab:
             )
             device = self.devices[job["device"]][job["hash"]]
             device["start_time"] = time.ctime()
+            kill_event = self.manager.Event()
+            self.kill_watcher.register(job, kill_event)
             async_runner = runAsync(
                 self.args,
                 device,
@@ -769,12 +997,17 @@ class RunLab:
                 self.benchmark_downloader,
                 self.file_storage,
                 self.device_manager.usb_controller,
+                kill_event,
             )
 
             # Watchdog will be used to kill currently running jobs
-            # based on user requests
+            # based on user requests. The host's kill watcher polls the
+            # server, so the watchdog only checks the local kill event.
             app = WatchDog(
-                async_runner, async_runner.didUserRequestJobKill, async_runner.killJob
+                async_runner,
+                async_runner.didUserRequestJobKill,
+                async_runner.killJob,
+                delay=KILL_EVENT_CHECK_INTERVAL,
             )
 
             global RUNNING_JOBS
@@ -788,7 +1021,13 @@ class RunLab:
             apply_async method.
             Ref: https://stackoverflow.com/a/6975654
             """
-            future = self.pool.submit(app)
+            if self.args.device_workers:
+                future = self.pool.submit(job["hash"], app)
+            else:
+                future = self.pool.submit(app)
+            future.add_done_callback(
+                lambda _, job=job: self.kill_watcher.unregister(job)
+            )
             future.add_done_callback(self.callback)
 
     def callback(self, future_result_dict):
@@ -800,6 +1039,8 @@ class RunLab:
             job = result["job"]
             device = result["device"]
             device = self.devices[device["kind"]][device["hash"]]
+            self.startup_latency[device["hash"]].observe(result["startup_latency"])
+            self._recordJobMetrics(job, device, result)
 
             # output benchmark log in main thread.
             getLogger().info(
@@ -823,12 +1064,73 @@ class RunLab:
             with open(content) as content_file:
                 content = json.load(content_file)
         job_cooldown = content.get("model", {}).get("cooldown", None)
+        self.affinity.complete(job, job["status"] == "DONE")
+        if self.affinity.getStats()["completed"] % STATS_REPORT_JOBS == 0:
+            self._reportAffinity()
+            self._reportStartupLatency()
         self._coolDown(
             device,
             force_reboot=job["status"] != "DONE",
             job_cooldown=job_cooldown,
         )
 
+    def _recordJobMetrics(self, job, device, result):
+        registry = getMetricsRegistry()
+        registry.incCounter(
+            "aibench_lab_jobs_total",
+            "Finished jobs by device kind and status.",
+            kind=device["kind"],
+            status=job["status"],
+        )
+        registry.observe(
+            "aibench_job_startup_latency_seconds",
+            "Time from submitting a job to the job starting in its worker.",
+            result["startup_latency"],
+            kind=device["kind"],
+        )
+        phase_times = result.get("phase_times", {})
+        if "runAsync.run" in phase_times:
+            registry.observe(
+                "aibench_job_duration_seconds",
+                "Run time of the jobs by device kind and status.",
+                phase_times["runAsync.run"]["seconds"],
+                JOB_LATENCY_BUCKETS,
+                kind=device["kind"],
+                status=job["status"],
+            )
+        # the phases include the download of the programs and models
+        for phase, times in phase_times.items():
+            registry.observe(
+                "aibench_job_phase_seconds",
+                "Time the jobs spent in each harness phase.",
+                times["seconds"],
+                JOB_LATENCY_BUCKETS,
+                phase=phase,
+            )
+
+    def _reportAffinity(self):
+        stats = self.affinity.getStats()
+        getLogger().info(
+            f"Device affinity on server {self.args.claimer_id}: "
+            f"{stats['hit_rate']:.1%} of the programs and models were already on "
+            f"the device, {stats['job_hit_rate']:.1%} of {stats['assignments']} "
+            f"jobs fully cached, {stats['deferrals']} deferrals."
+        )
+
+    def _reportStartupLatency(self):
+        means = []
+        for hash, histogram in self.startup_latency.items():
+            getLogger().info(f"Job startup latency on device {hash}: {histogram.summary()}")
+            if histogram.count:
+                means.append(histogram.sum / histogram.count)
+        if means:
+            # 1.0 when the jobs of every device wait equally long for a worker
+            getLogger().info(
+                "Worker allocation fairness on server {}: {:.3f}".format(
+                    self.args.claimer_id, jainFairness(means)
+                )
+            )
+
     def _coolDown(self, device, force_reboot=False, job_cooldown=None):
         t = CoolDownDevice(device, self.args, self.db, force_reboot, job_cooldown)
         t.start()
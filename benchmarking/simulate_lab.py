@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+
+# pyre-unsafe
+
+##############################################################################
+# Copyright 2017-present, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+##############################################################################
+
+
+import argparse
+import json
+import time
+
+from lab_simulator.job_queue import serveJobQueue, SQLiteJobQueue
+from lab_simulator.simulator import generateTrace, LabSimulator, parseDevices
+from utils.custom_logger import getLogger, setLoggerLevel
+
+parser = argparse.ArgumentParser(
+    description="Load-test the lab scheduler offline with fake devices."
+)
+parser.add_argument(
+    "--arrival_rate",
+    default=0.05,
+    type=float,
+    help="Average job arrivals per simulated second of the synthetic trace.",
+)
+parser.add_argument(
+    "--devices",
+    default="Pixel4:android:4,iPhone12:ios:2",
+    help="The simulated devices, as a comma separated list of "
+    "<kind>:<android|ios>:<count>.",
+)
+parser.add_argument(
+    "--lab_hosts",
+    default=1,
+    type=int,
+    help="Number of simulated lab hosts the devices are spread over.",
+)
+parser.add_argument(
+    "--logger_level",
+    default="warning",
+    choices=["debug", "info", "warning", "error"],
+    help="Specify the logger level",
+)
+parser.add_argument(
+    "--num_jobs",
+    default=200,
+    type=int,
+    help="Number of jobs in the synthetic trace.",
+)
+parser.add_argument(
+    "--output",
+    help="Write the report as json to this file.",
+)
+parser.add_argument(
+    "--platform_profiles",
+    help="A json string overriding the latency and failure distributions of "
+    'the fake platforms, e.g. {"android": {"median": 60, "failure_rate": 0.1}}. '
+    "The fields are setup, median, sigma, failure_rate and cooldown.",
+)
+parser.add_argument(
+    "--save_trace",
+    help="Save the synthetic trace to this file.",
+)
+parser.add_argument(
+    "--seed",
+    type=int,
+    help="Seed of the trace and of the fake platforms.",
+)
+parser.add_argument(
+    "--serve",
+    type=int,
+    help="Only serve the SQLite job queue at http://127.0.0.1:<port>/benchmark/, "
+    "e.g. to point run_lab's --server_addr at it.",
+)
+parser.add_argument(
+    "--time_scale",
+    default=0.01,
+    type=float,
+    help="Real seconds per simulated second.",
+)
+parser.add_argument(
+    "--timeout",
+    type=float,
+    help="Stop the simulation after this many real seconds.",
+)
+parser.add_argument(
+    "--trace",
+    help="Replay the job arrival trace in this json file instead of a "
+    "synthetic one. Each entry has arrival, identifier, device, program "
+    "and model fields.",
+)
+
+
+class SimulateLab:
+    def __init__(self, raw_args=None):
+        self.args, self.unknowns = parser.parse_known_args(raw_args)
+        setLoggerLevel(self.args.logger_level)
+
+    def run(self):
+        if self.args.serve is not None:
+            return self._serve()
+        devices = parseDevices(self.args.devices)
+        if self.args.trace:
+            with open(self.args.trace) as f:
+                trace = json.load(f)
+        else:
+            kinds = sorted({device["kind"] for device in devices})
+            trace = generateTrace(
+                self.args.num_jobs, self.args.arrival_rate, kinds, seed=self.args.seed
+            )
+        if self.args.save_trace:
+            with open(self.args.save_trace, "w") as f:
+                json.dump(trace, f, indent=2)
+        profiles = {}
+        if self.args.platform_profiles:
+            profiles = json.loads(self.args.platform_profiles)
+        # the unknown arguments are passed to the simulated run_lab hosts
+        simulator = LabSimulator(
+            devices,
+            trace,
+            num_hosts=self.args.lab_hosts,
+            profiles=profiles,
+            time_scale=self.args.time_scale,
+            seed=self.args.seed,
+            lab_args=self.unknowns,
+        )
+        report = simulator.run(timeout=self.args.timeout)
+        print(json.dumps(report, indent=2, sort_keys=True))
+        if self.args.output:
+            with open(self.args.output, "w") as f:
+                json.dump(report, f, indent=2, sort_keys=True)
+        return report
+
+    def _serve(self):
+        server = serveJobQueue(SQLiteJobQueue(), port=self.args.serve)
+        getLogger().warning(
+            "Serving the job queue at http://{}:{}/benchmark/".format(
+                *server.server_address
+            )
+        )
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    app = SimulateLab()
+    app.run()
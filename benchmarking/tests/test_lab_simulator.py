@@ -0,0 +1,74 @@
+# pyre-strict
+import unittest
+
+from bridge.db import DBDriver
+from lab_simulator.job_queue import LocalDBDriver, serveJobQueue, SQLiteJobQueue
+from lab_simulator.simulator import generateTrace, LabSimulator, parseDevices
+
+
+class JobQueueTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.queue = SQLiteJobQueue()
+        self.db = LocalDBDriver(self.queue)
+
+    def test_claim_run_done(self) -> None:
+        self.db.submitBenchmarks({"a": 1}, "Pixel4,Pixel4", 7, "user")
+        jobs = self.db.claimBenchmarks("lab", "Pixel4,Pixel4", "h0,h1")
+        # like the ailab server, one job per device kind and claim
+        self.assertEqual(len(jobs), 1)
+        self.assertEqual(jobs[0]["benchmarks"], {"a": 1})
+        job_id = jobs[0]["id"]
+        self.db.runBenchmarks("lab", str(job_id))
+        self.db.doneBenchmarks(job_id, "DONE", "{}", "log")
+        statuses = {s["id"]: s["status"] for s in self.db.statusBenchmarks(7)}
+        self.assertEqual(statuses[job_id], "DONE")
+        self.assertEqual(len(self.db.claimBenchmarks("lab", "Pixel4", "h0")), 1)
+
+    def test_release(self) -> None:
+        self.db.submitBenchmarks({}, "Pixel4", 1, "user")
+        jobs = self.db.claimBenchmarks("lab0", "Pixel4", "h0")
+        self.db.releaseBenchmarks("lab0", str(jobs[0]["id"]))
+        jobs = self.db.claimBenchmarks("lab1", "Pixel4", "h1")
+        self.assertEqual(jobs[0]["claimer"], "lab1")
+
+    def test_http_endpoint(self) -> None:
+        server = serveJobQueue(self.queue)
+        try:
+            db = DBDriver(
+                None,
+                None,
+                None,
+                "benchmark_info",
+                "simulator",
+                False,
+                "http://{}:{}/benchmark/".format(*server.server_address),
+            )
+            db.submitBenchmarks({"a": 1}, "iPhone12", 3, "user")
+            jobs = db.claimBenchmarks("lab", "iPhone12", "h0")
+            self.assertEqual(jobs[0]["benchmarks"], {"a": 1})
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class LabSimulatorTest(unittest.TestCase):
+    def test_replay(self) -> None:
+        devices = parseDevices("Pixel4:android:2,iPhone12:ios:1")
+        trace = generateTrace(10, 0.5, ["Pixel4", "iPhone12"], seed=0)
+        profiles = {
+            "android": {"setup": 1, "median": 2, "failure_rate": 0, "cooldown": 0},
+            "ios": {"setup": 1, "median": 2, "failure_rate": 0, "cooldown": 0},
+        }
+        simulator = LabSimulator(
+            devices, trace, profiles=profiles, time_scale=0.01, seed=0
+        )
+        report = simulator.run(timeout=60)
+        self.assertEqual(report["finished"], 10)
+        self.assertEqual(report["failed"], 0)
+        self.assertGreater(report["throughput_per_hour"], 0)
+        self.assertLessEqual(report["queue_wait_p50"], report["queue_wait_p99"])
+        self.assertEqual(len(report["device_utilization"]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
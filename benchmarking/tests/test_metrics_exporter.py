@@ -0,0 +1,87 @@
+# pyre-strict
+import unittest
+import urllib.error
+import urllib.request
+
+from bridge.db import DBDriver
+from lab_simulator.job_queue import serveJobQueue, SQLiteJobQueue
+from metrics.exporter import getMetricsRegistry, MetricsRegistry, serveMetrics
+
+
+def _scrape(server) -> dict[str, float]:
+    url = "http://{}:{}/metrics".format(*server.server_address)
+    with urllib.request.urlopen(url, timeout=10) as response:
+        assert response.headers["Content-Type"].startswith("text/plain")
+        text = response.read().decode("utf-8")
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith("#"):
+            continue
+        name, value = line.rsplit(" ", 1)
+        samples[name] = float(value)
+    return samples
+
+
+class MetricsExporterTest(unittest.TestCase):
+    def test_scrape(self) -> None:
+        registry = MetricsRegistry()
+        registry.incCounter("jobs_total", "Jobs.", status="DONE")
+        registry.incCounter("jobs_total", "Jobs.", 2, status="DONE")
+        registry.incCounter("jobs_total", "Jobs.", status="FAILED")
+        registry.setGauge("running_jobs", "Running jobs.", 3)
+        registry.observe("latency_seconds", "Latency.", 0.2, buckets=(0.1, 1.0))
+        registry.observe("latency_seconds", "Latency.", 5.0, buckets=(0.1, 1.0))
+        registry.addCollector(
+            lambda r: r.setGauge("devices", 'Devices "by" kind.', 2, kind='a"b')
+        )
+        server = serveMetrics(0, registry=registry)
+        try:
+            samples = _scrape(server)
+            with self.assertRaises(urllib.error.HTTPError):
+                urllib.request.urlopen(
+                    "http://{}:{}/other".format(*server.server_address), timeout=10
+                )
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(samples['jobs_total{status="DONE"}'], 3)
+        self.assertEqual(samples['jobs_total{status="FAILED"}'], 1)
+        self.assertEqual(samples["running_jobs"], 3)
+        self.assertEqual(samples['devices{kind="a\\"b"}'], 2)
+        self.assertEqual(samples['latency_seconds_bucket{le="0.1"}'], 0)
+        self.assertEqual(samples['latency_seconds_bucket{le="1.0"}'], 1)
+        self.assertEqual(samples['latency_seconds_bucket{le="+Inf"}'], 2)
+        self.assertEqual(samples["latency_seconds_count"], 2)
+        self.assertAlmostEqual(samples["latency_seconds_sum"], 5.2)
+
+    def test_db_driver_requests(self) -> None:
+        queue_server = serveJobQueue(SQLiteJobQueue())
+        server = serveMetrics(0)
+        try:
+            db = DBDriver(
+                None,
+                None,
+                None,
+                "benchmark_info",
+                "metrics",
+                False,
+                "http://{}:{}/benchmark/".format(*queue_server.server_address),
+            )
+            before = _scrape(server).get(
+                'aibench_db_request_seconds_count{action="claim"}', 0
+            )
+            db.claimBenchmarks("lab", "Pixel4", "h0")
+            samples = _scrape(server)
+        finally:
+            server.shutdown()
+            server.server_close()
+            queue_server.shutdown()
+            queue_server.server_close()
+        self.assertEqual(
+            samples['aibench_db_request_seconds_count{action="claim"}'], before + 1
+        )
+        self.assertIs(server.registry, getMetricsRegistry())
+
+
+if __name__ == "__main__":
+    unittest.main()
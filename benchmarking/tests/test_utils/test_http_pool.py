@@ -0,0 +1,90 @@
+# pyre-strict
+import asyncio
+import gzip
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+from utils import utilities
+from utils.utilities import (
+    asyncRequestsJson,
+    closeAsyncHttpSession,
+    getHttpConnectionStats,
+    getHttpSession,
+    requestsJson,
+)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    bodies = []
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        _Handler.bodies.append(body)
+        content = json.dumps({"status": "success"}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(content)))
+        self.end_headers()
+        self.wfile.write(content)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+class HttpPoolTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.url = f"http://127.0.0.1:{self.server.server_port}/"
+        _Handler.bodies = []
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_session_is_reused(self) -> None:
+        before = getHttpConnectionStats()
+        for _ in range(3):
+            self.assertEqual(
+                requestsJson(self.url, data={"a": "1"}), {"status": "success"}
+            )
+        after = getHttpConnectionStats()
+        self.assertIs(getHttpSession(), getHttpSession())
+        self.assertEqual(after["requests"] - before["requests"], 3)
+        self.assertEqual(after["new_connections"] - before["new_connections"], 1)
+
+    def test_async_session_is_reused(self) -> None:
+        async def post():
+            results = []
+            for _ in range(3):
+                results.append(await asyncRequestsJson(None, self.url, data={"a": "1"}))
+            await closeAsyncHttpSession()
+            return results
+
+        before = getHttpConnectionStats()
+        results = asyncio.run(post())
+        after = getHttpConnectionStats()
+        self.assertEqual(results, [{"status": "success"}] * 3)
+        self.assertEqual(
+            after["async_new_connections"] - before["async_new_connections"], 1
+        )
+        self.assertEqual(
+            after["async_reused_connections"] - before["async_reused_connections"], 2
+        )
+
+    def test_compressed_body(self) -> None:
+        value = "x" * (utilities.HTTP_COMPRESS_MIN_BYTES * 2)
+        requestsJson(self.url, data={"a": value}, compress=True)
+        self.assertEqual(parse_qs(_Handler.bodies[-1].decode("utf-8")), {"a": [value]})
+
+
+if __name__ == "__main__":
+    unittest.main()
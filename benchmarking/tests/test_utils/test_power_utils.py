@@ -0,0 +1,72 @@
+# pyre-strict
+import unittest
+
+import numpy as np
+from utils.power_utils import (
+    get_benchmark_start_end,
+    post_process_power_data,
+    summarize_power_samples,
+)
+
+
+def _reference_start_end(data: list[float], window_size: int) -> tuple[int, int]:
+    """The sliding update get_benchmark_start_end used before prefix sums."""
+    half = window_size // 2
+    conv = [sum(data[half:window_size]) - sum(data[:half])]
+    for i in range(len(data) - window_size):
+        conv.append(conv[-1] + data[i] - 2 * data[i + half] + data[i + window_size])
+    return int(np.argmax(conv)) + half, int(np.argmin(conv)) + half
+
+
+class PowerUtilsTest(unittest.TestCase):
+    def test_matches_reference(self) -> None:
+        rng = np.random.default_rng(0)
+        for size, window in ((20, 20), (100, 10), (1000, 100), (5000, 600)):
+            # integer samples keep both implementations exact, ties included
+            data = rng.integers(0, 5, size).astype(float).tolist()
+            self.assertEqual(
+                get_benchmark_start_end(data, window),
+                _reference_start_end(data, window),
+            )
+            steps = np.repeat([1.0, 6.0, 1.0], size // 3 + 1)
+            data = steps + rng.normal(0, 0.5, len(steps))
+            self.assertEqual(
+                get_benchmark_start_end(data, window),
+                _reference_start_end(data.tolist(), window),
+            )
+
+    def test_flat_trace(self) -> None:
+        self.assertEqual(get_benchmark_start_end([1.0] * 10, 4), (2, 2))
+
+    def test_post_process(self) -> None:
+        sample_rate = 100
+        power = np.concatenate(
+            [np.full(2000, 100.0), np.full(3000, 400.0), np.full(2000, 100.0)]
+        )
+        data = post_process_power_data(
+            {"total_power": power}, sample_rate=sample_rate, num_iters=30
+        )
+        self.assertAlmostEqual(data["power"]["values"][0], 300.0)
+        self.assertAlmostEqual(data["baseline_power"]["values"][0], 100.0)
+        # 30 s of benchmark over 30 iterations
+        self.assertAlmostEqual(data["latency"]["values"][0], 1000.0)
+
+    def test_summarize_power_samples(self) -> None:
+        times = np.arange(0, 10.0, 0.1)
+        running = (times >= 2.0) & (times < 7.0)
+        power = np.where(running, 3000.0, 1000.0)
+        data = summarize_power_samples(times, power, running, num_iters=20)
+        # 4.9 s at 3 W between the first and last running sample
+        self.assertAlmostEqual(data["average_power"]["values"][0], 3000.0)
+        self.assertAlmostEqual(data["energy"]["values"][0], 14.7)
+        self.assertAlmostEqual(data["energy_per_inference"]["values"][0], 0.735)
+        self.assertAlmostEqual(data["baseline_power"]["values"][0], 1000.0)
+
+        # the program was never seen running, use the whole capture
+        data = summarize_power_samples(times, power, running & False, num_iters=-1)
+        self.assertNotIn("energy_per_inference", data)
+        self.assertNotIn("baseline_power", data)
+
+
+if __name__ == "__main__":
+    unittest.main()
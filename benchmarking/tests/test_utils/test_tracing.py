@@ -0,0 +1,74 @@
+# pyre-strict
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+from utils.tracing import (
+    getTracer,
+    startTrace,
+    stopTrace,
+    summarizeTrace,
+    traced,
+    traceSpan,
+)
+
+
+@traced("work")
+def _work() -> None:
+    with traceSpan("inner", step=1):
+        time.sleep(0.01)
+
+
+class TracingTest(unittest.TestCase):
+    def tearDown(self) -> None:
+        stopTrace()
+
+    def test_no_trace(self) -> None:
+        self.assertIsNone(getTracer())
+        with traceSpan("nothing") as span:
+            self.assertIsNone(span)
+        _work()
+        self.assertEqual(summarizeTrace(0), {})
+
+    def test_nested_spans(self) -> None:
+        tracer = startTrace()
+        start = time.time()
+        _work()
+        _work()
+        summary = summarizeTrace(start)
+        self.assertEqual(summary["work"]["count"], 2)
+        self.assertEqual(summary["inner"]["count"], 2)
+        self.assertGreaterEqual(summary["work"]["seconds"], 0.02)
+
+        events = {e["name"]: e for e in tracer.getTrace()["traceEvents"]}
+        inner, work = events["inner"], events["work"]
+        self.assertEqual(inner["ph"], "X")
+        self.assertEqual(inner["args"], {"step": 1})
+        # the inner span nests in the outer one on the same thread
+        self.assertEqual(inner["tid"], work["tid"])
+        self.assertGreaterEqual(inner["ts"], work["ts"])
+        self.assertLessEqual(inner["ts"] + inner["dur"], work["ts"] + work["dur"])
+
+    def test_threads(self) -> None:
+        tracer = startTrace()
+        start = time.time()
+        thread = threading.Thread(target=_work)
+        thread.start()
+        thread.join()
+        # spans of other threads are not part of this thread's summary
+        self.assertEqual(summarizeTrace(start), {})
+        self.assertEqual(tracer.summarize()["work"]["count"], 1)
+
+        with tempfile.TemporaryDirectory() as tempdir:
+            filename = tracer.save(os.path.join(tempdir, "trace.json"))
+            with open(filename) as f:
+                trace = json.load(f)
+        self.assertEqual(len(trace["traceEvents"]), 2)
+        self.assertNotIn("start", trace["traceEvents"][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
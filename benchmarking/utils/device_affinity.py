@@ -0,0 +1,186 @@
+#!/usr/bin/env python
+
+# pyre-unsafe
+
+##############################################################################
+# Copyright 2017-present, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+##############################################################################
+
+
+import threading
+import time
+from collections import OrderedDict
+
+from utils.custom_logger import getLogger
+
+# Seconds a job may be sent back to the queue while it waits for a busy device
+# that already holds its program and models. 0 disables the deferral, jobs then
+# only prefer matching devices among the free ones.
+DEFAULT_AFFINITY_MAX_DEFER = 0
+# Artifacts remembered per device and kind, least recently used first out.
+MAX_HELD_ARTIFACTS = 16
+
+
+def getJobArtifacts(job):
+    """Return the program and model keys a job needs on the device.
+    A key is the md5 of the file when it is known, else its location."""
+    programs = set()
+    models = set()
+    benchmarks = job.get("benchmarks", {})
+    info = benchmarks.get("info", {})
+    for group in ("treatment", "control"):
+        for program in info.get(group, {}).get("programs", {}).values():
+            key = _getArtifactKey(program)
+            if key:
+                programs.add(key)
+    content = benchmarks.get("benchmark", {}).get("content", {})
+    if isinstance(content, dict):
+        model = content.get("model", {})
+        for field in ("files", "libraries"):
+            for model_file in model.get(field, {}).values():
+                key = _getArtifactKey(model_file)
+                if key:
+                    models.add(key)
+    return {"programs": programs, "models": models}
+
+
+def _getArtifactKey(entry):
+    if not isinstance(entry, dict):
+        return None
+    return entry.get("md5") or entry.get("location")
+
+
+class DeviceAffinity:
+    """
+    Tracks the programs and models each device of a lab host holds from its
+    previous jobs, and picks for a job the free device that already holds most
+    of them. If only a busy device matches, the job may be sent back to the
+    queue for at most max_defer seconds so that it does not starve.
+    """
+
+    def __init__(self, max_defer=DEFAULT_AFFINITY_MAX_DEFER):
+        self.max_defer = max_defer
+        # device hash -> {"programs": OrderedDict, "models": OrderedDict}
+        self.held = {}
+        # job id -> time the job was first deferred
+        self.deferred = {}
+        # job id -> (device hash, artifacts) of the running jobs
+        self.running = {}
+        self.stats = {
+            "assignments": 0,
+            "completed": 0,
+            "job_hits": 0,
+            "artifact_hits": 0,
+            "artifact_total": 0,
+            "deferrals": 0,
+        }
+        self.lock = threading.Lock()
+
+    def selectDevice(self, job, devices):
+        """Return the hash of the device the job should run on, or None if the
+        job should be deferred or no device is free.
+        devices maps the candidate hashes to their device entries."""
+        artifacts = getJobArtifacts(job)
+        best_hash = None
+        best_score = -1
+        with self.lock:
+            for hash, device in devices.items():
+                if device["available"] is not True:
+                    continue
+                score = self._score(hash, artifacts)
+                if score > best_score:
+                    best_hash = hash
+                    best_score = score
+            if best_hash is not None and best_score == 0 and self._shouldDefer(
+                job, devices, artifacts
+            ):
+                return None
+            self.deferred.pop(job["id"], None)
+        if best_hash is not None:
+            self._recordAssignment(job, best_hash, artifacts)
+        return best_hash
+
+    def isDeferred(self, job):
+        with self.lock:
+            return job["id"] in self.deferred
+
+    def complete(self, job, success):
+        """Remember the artifacts of a job once it completed on its device.
+        After a failure the state of the device is unknown and is dropped."""
+        with self.lock:
+            hash, artifacts = self.running.pop(job["id"], (None, None))
+            if hash is None:
+                return
+            self.stats["completed"] += 1
+            if not success:
+                self.held.pop(hash, None)
+                return
+            held = self.held.setdefault(
+                hash, {"programs": OrderedDict(), "models": OrderedDict()}
+            )
+            for kind in ("programs", "models"):
+                for key in artifacts[kind]:
+                    held[kind].pop(key, None)
+                    held[kind][key] = True
+                while len(held[kind]) > MAX_HELD_ARTIFACTS:
+                    held[kind].popitem(last=False)
+
+    def getStats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        total = stats["artifact_total"]
+        stats["hit_rate"] = round(stats["artifact_hits"] / total, 3) if total else 0
+        assignments = stats["assignments"]
+        stats["job_hit_rate"] = (
+            round(stats["job_hits"] / assignments, 3) if assignments else 0
+        )
+        return stats
+
+    def _score(self, hash, artifacts):
+        held = self.held.get(hash)
+        if held is None:
+            return 0
+        return sum(
+            1 for kind in ("programs", "models") for key in artifacts[kind]
+            if key in held[kind]
+        )
+
+    def _shouldDefer(self, job, devices, artifacts):
+        if self.max_defer <= 0 or job.get("hash") is not None:
+            return False
+        if not any(
+            self._score(hash, artifacts) > 0
+            for hash, device in devices.items()
+            if device["available"] is not True
+        ):
+            return False
+        now = time.time()
+        # drop the jobs that were claimed by other hosts in the meantime
+        self.deferred = {
+            id: first
+            for id, first in self.deferred.items()
+            if now - first < 2 * self.max_defer
+        }
+        first = self.deferred.setdefault(job["id"], now)
+        if now - first >= self.max_defer:
+            return False
+        self.stats["deferrals"] += 1
+        return True
+
+    def _recordAssignment(self, job, hash, artifacts):
+        with self.lock:
+            self.running[job["id"]] = (hash, artifacts)
+            hits = self._score(hash, artifacts)
+            total = len(artifacts["programs"]) + len(artifacts["models"])
+            self.stats["assignments"] += 1
+            self.stats["artifact_hits"] += hits
+            self.stats["artifact_total"] += total
+            if total and hits == total:
+                self.stats["job_hits"] += 1
+        getLogger().info(
+            f"Device {hash} holds {hits} of the {total} programs and models of the job."
+        )
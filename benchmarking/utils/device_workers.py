@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+# pyre-unsafe
+
+##############################################################################
+# Copyright 2017-present, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+##############################################################################
+
+
+import importlib
+import multiprocessing
+import queue
+import threading
+import traceback
+from concurrent.futures import Future
+
+from utils.custom_logger import getLogger
+from utils.utilities import setRunStatus
+
+# Modules a worker imports before its first job.
+PRELOAD_MODULES = (
+    "harness",
+    "frameworks.frameworks",
+    "platforms.platforms",
+    "data_converters.data_converters",
+    "benchmarks.benchmarks",
+    "reporters.reporters",
+)
+WORKER_SHUTDOWN_TIMEOUT = 10
+
+# Platform objects of the device served by this worker process, None outside
+# of the device workers.
+_platform_cache = None
+
+
+def getWorkerPlatformCache():
+    return _platform_cache
+
+
+def jainFairness(values):
+    """Jain's fairness index, 1.0 when all values are equal and 1/n when one
+    value takes everything."""
+    values = [v for v in values if v is not None]
+    if not values:
+        return 1.0
+    square_sum = sum(v * v for v in values)
+    if square_sum == 0:
+        return 1.0
+    return sum(values) ** 2 / (len(values) * square_sum)
+
+
+def _workerMain(key, jobs, results, initializer, preload):
+    global _platform_cache
+    _platform_cache = {}
+    if initializer is not None:
+        initializer()
+    for module in preload:
+        try:
+            importlib.import_module(module)
+        except Exception:
+            getLogger().exception(f"Device worker {key} failed to import {module}")
+    while True:
+        try:
+            task = jobs.get()
+        except Exception:
+            getLogger().exception(f"Device worker {key} failed to receive a job")
+            continue
+        if task is None:
+            break
+        task_id, fn = task
+        setRunStatus(0, overwrite=True)
+        try:
+            result = fn()
+        except Exception:
+            results.put((task_id, False, traceback.format_exc()))
+        else:
+            results.put((task_id, True, result))
+
+
+class DeviceWorkerPool:
+    """
+    One long-lived worker process per device. The jobs of a device are fed to
+    its worker over a queue, so a long job on one device never holds a worker
+    another device needs. The worker keeps its imported modules and the
+    platform object of its device between jobs.
+    """
+
+    def __init__(self, initializer=None, preload=PRELOAD_MODULES):
+        self.initializer = initializer
+        self.preload = preload
+        # device key -> {"process": Process, "queue": Queue}
+        self.workers = {}
+        self.results = multiprocessing.Queue()
+        # task id -> (device key, future)
+        self.pending = {}
+        self.next_id = 0
+        self.lock = threading.Lock()
+        self.running = True
+        self.collector = threading.Thread(target=self._collectResults, daemon=True)
+        self.collector.start()
+
+    def submit(self, key, fn):
+        """Run fn in the worker of device key, return a Future of its result."""
+        future = Future()
+        with self.lock:
+            task_id = self.next_id
+            self.next_id += 1
+            self.pending[task_id] = (key, future)
+            worker = self._getWorker(key)
+        worker["queue"].put((task_id, fn))
+        return future
+
+    def shutdown(self):
+        self.running = False
+        with self.lock:
+            workers = list(self.workers.values())
+            self.workers = {}
+        for worker in workers:
+            worker["queue"].put(None)
+        for worker in workers:
+            worker["process"].join(WORKER_SHUTDOWN_TIMEOUT)
+            if worker["process"].is_alive():
+                worker["process"].terminate()
+        self.collector.join(WORKER_SHUTDOWN_TIMEOUT)
+
+    def _getWorker(self, key):
+        worker = self.workers.get(key)
+        if worker is None or not worker["process"].is_alive():
+            jobs = multiprocessing.Queue()
+            process = multiprocessing.Process(
+                target=_workerMain,
+                args=(key, jobs, self.results, self.initializer, self.preload),
+                name=f"device_worker_{key}",
+            )
+            process.start()
+            getLogger().info(f"Started worker process {process.pid} for device {key}")
+            worker = {"process": process, "queue": jobs}
+            self.workers[key] = worker
+        return worker
+
+    def _collectResults(self):
+        while self.running:
+            try:
+                task_id, ok, value = self.results.get(timeout=1)
+            except queue.Empty:
+                self._checkWorkers()
+                continue
+            with self.lock:
+                _, future = self.pending.pop(task_id, (None, None))
+            if future is None:
+                continue
+            if ok:
+                future.set_result(value)
+            else:
+                future.set_exception(RuntimeError(value))
+
+    def _checkWorkers(self):
+        """Fail the jobs of the workers that died, they restart on next submit."""
+        failed = []
+        with self.lock:
+            for key, worker in list(self.workers.items()):
+                if worker["process"].is_alive():
+                    continue
+                exitcode = worker["process"].exitcode
+                del self.workers[key]
+                for task_id, (task_key, future) in list(self.pending.items()):
+                    if task_key == key:
+                        del self.pending[task_id]
+                        failed.append((future, key, exitcode))
+        for future, key, exitcode in failed:
+            future.set_exception(
+                RuntimeError(f"Worker of device {key} exited with code {exitcode}")
+            )
@@ -0,0 +1,111 @@
+#!/usr/bin/env python
+
+# pyre-unsafe
+
+##############################################################################
+# Copyright 2017-present, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+##############################################################################
+
+
+import threading
+import time
+
+from utils.custom_logger import getLogger
+
+DEFAULT_KILL_POLL_INTERVAL = 5.0
+# Stop trying the batched status action after this many consecutive failures.
+MAX_BATCH_FAILURES = 3
+
+
+class KillRequestWatcher:
+    """
+    Watches the status of all jobs running on a lab host. The identifiers of
+    the running jobs are queried in one batched request per interval, and the
+    kill event of every job whose identifier was killed by the user is set.
+    Each job worker only polls its local event.
+    """
+
+    def __init__(self, db, interval=DEFAULT_KILL_POLL_INTERVAL):
+        self.db = db
+        self.interval = interval
+        # identifier -> {job id: kill event}
+        self.jobs = {}
+        self.lock = threading.Lock()
+        self.running = False
+        self.batch_failures = 0
+        self.watcher = None
+
+    def start(self):
+        self.running = True
+        self.watcher = threading.Thread(target=self._runWatcher, daemon=True)
+        self.watcher.start()
+
+    def stop(self):
+        self.running = False
+        if self.watcher is not None:
+            self.watcher.join(timeout=self.interval + 1)
+
+    def register(self, job, kill_event):
+        with self.lock:
+            identifier = str(job["identifier"])
+            self.jobs.setdefault(identifier, {})[job["id"]] = kill_event
+
+    def unregister(self, job):
+        with self.lock:
+            identifier = str(job["identifier"])
+            events = self.jobs.get(identifier, {})
+            events.pop(job["id"], None)
+            if not events:
+                self.jobs.pop(identifier, None)
+
+    def _runWatcher(self):
+        while self.running:
+            try:
+                self.checkOnce()
+            except Exception:
+                getLogger().exception("Error while checking for job kill requests.")
+            time.sleep(self.interval)
+
+    def checkOnce(self):
+        with self.lock:
+            identifiers = list(self.jobs.keys())
+        if not identifiers:
+            return
+        killed = self._getKilledIdentifiers(identifiers)
+        with self.lock:
+            for identifier in killed:
+                for job_id, kill_event in self.jobs.get(identifier, {}).items():
+                    if not kill_event.is_set():
+                        getLogger().info(
+                            f"Kill requested for benchmark {identifier} id ({job_id})"
+                        )
+                        kill_event.set()
+
+    def _getKilledIdentifiers(self, identifiers):
+        statuses = None
+        if self.batch_failures < MAX_BATCH_FAILURES:
+            statuses = self.db.statusBenchmarksBatch(identifiers)
+            if statuses is None:
+                self.batch_failures += 1
+                if self.batch_failures == MAX_BATCH_FAILURES:
+                    getLogger().warning(
+                        "Batched status queries keep failing, "
+                        "falling back to one query per identifier."
+                    )
+            else:
+                self.batch_failures = 0
+        if statuses is None:
+            statuses = []
+            for identifier in identifiers:
+                for status in self.db.statusBenchmarks(identifier):
+                    status["identifier"] = identifier
+                    statuses.append(status)
+        return {
+            str(status["identifier"])
+            for status in statuses
+            if status["status"] == "KILLED"
+        }
@@ -19,10 +19,27 @@ from time import sleep
 import Monsoon.HVPM as HVPM
 import Monsoon.Operations as op
 import Monsoon.sampleEngine as sampleEngine
+import numpy as np
 from bridge.file_storage.upload_files.file_uploader import FileUploader
 from utils.custom_logger import getLogger
 from utils.power_utils import post_process_power_data
 
+POWER_DATA_COLUMNS = (
+    "time",
+    "current",
+    "voltage",
+    "usb_current",
+    "usb_voltage",
+    "total_power",
+)
+# The npz archive holds one compressed array per column, the csv is
+# kept for tools that cannot read numpy archives.
+POWER_OUTPUT_FORMATS = {
+    "npz": (".npz",),
+    "csv": (".csv",),
+    "both": (".npz", ".csv"),
+}
+
 
 def collectPowerData(
     hash,
@@ -31,6 +48,7 @@ def collectPowerData(
     num_iters,
     method="monsoon",
     monsoon_map=None,
+    output_format="npz",
 ):
     has_usb = method == "monsoon_with_usb"
     Mon = HVPM.Monsoon()
@@ -102,64 +120,70 @@ def collectPowerData(
     if repeat >= 5:
         raise Exception("Failed to close device")
 
-    power_data, url = _extract_samples(samples, has_usb)
+    power_data, urls = _extract_samples(samples, has_usb, output_format)
 
     data = post_process_power_data(power_data, sample_rate=5000, num_iters=num_iters)
-    data["power_trace"] = url
+    data["power_trace"] = urls.get(".npz", urls.get(".csv"))
+    if output_format == "both":
+        data["power_trace_csv"] = urls[".csv"]
 
     return data
 
 
-def _extract_samples(samples, has_usb):
+def _extract_samples(samples, has_usb, output_format="npz"):
+    channels = sampleEngine.channels
+    time_stamp = np.asarray(samples[channels.timeStamp], dtype=np.float64)
+    current = np.asarray(samples[channels.MainCurrent], dtype=np.float64)
+    voltage = np.asarray(samples[channels.MainVoltage], dtype=np.float64)
+    if has_usb:
+        usb_current = np.asarray(samples[channels.USBCurrent], dtype=np.float64)
+        usb_voltage = np.asarray(samples[channels.USBVoltage], dtype=np.float64)
+        total_power = current * voltage + usb_current * usb_voltage
+    else:
+        usb_current = np.zeros_like(current)
+        usb_voltage = np.zeros_like(current)
+        total_power = current * voltage
     power_data = {
-        "time": [],
-        "current": [],
-        "voltage": [],
-        "usb_current": [],
-        "usb_voltage": [],
-        "total_power": [],
+        "time": time_stamp,
+        "current": current,
+        "voltage": voltage,
+        "usb_current": usb_current,
+        "usb_voltage": usb_voltage,
+        "total_power": total_power,
     }
 
-    for i in range(len(samples[sampleEngine.channels.timeStamp])):
-        time_stamp = samples[sampleEngine.channels.timeStamp][i]
-        current = samples[sampleEngine.channels.MainCurrent][i]
-        voltage = samples[sampleEngine.channels.MainVoltage][i]
-        if has_usb:
-            usb_current = samples[sampleEngine.channels.USBCurrent][i]
-            usb_voltage = samples[sampleEngine.channels.USBVoltage][i]
-        power_data["time"].append(time_stamp)
-        power_data["current"].append(current)
-        power_data["voltage"].append(voltage)
-        if has_usb:
-            power_data["usb_current"].append(usb_current)
-            power_data["usb_voltage"].append(usb_voltage)
-            power_data["total_power"].append(
-                (current * voltage) + (usb_current * usb_voltage)
-            )
-        else:
-            power_data["usb_current"].append(0)
-            power_data["usb_voltage"].append(0)
-            power_data["total_power"].append(current * voltage)
-
-    with tempfile.NamedTemporaryFile(
-        mode="w", delete=False, prefix="power_data_", suffix=".csv"
-    ) as f:
-        filename = f.name
-        getLogger().info(f"Writing power data to file: {f.name}")
-        f.write("time, current, voltage, usb_current, usb_voltage, total_power\n")
-        for i in range(len(power_data["time"])):
-            f.write(
-                f"{power_data['time'][i]:.4f}, {power_data['current'][i]:.4f}, "
-                f"{power_data['voltage'][i]:.4f}, {power_data['usb_current'][i]:.4f}, "
-                f"{power_data['usb_voltage'][i]:.4f}, {power_data['total_power'][i]:.4f}\n"
-            )
-
-    getLogger().info(f"Uploading power file {filename}")
     output_file_uploader = FileUploader("output_files").get_uploader()
-    url = output_file_uploader.upload_file(filename)
-    getLogger().info(f"Uploaded power url {url}")
-    os.unlink(filename)
-    return power_data, url
+    urls = {}
+    for suffix in _getOutputSuffixes(output_format):
+        with tempfile.NamedTemporaryFile(
+            delete=False, prefix="power_data_", suffix=suffix
+        ) as f:
+            filename = f.name
+            getLogger().info(f"Writing power data to file: {filename}")
+            if suffix == ".npz":
+                np.savez_compressed(f, **power_data)
+            else:
+                np.savetxt(
+                    f,
+                    np.column_stack([power_data[c] for c in POWER_DATA_COLUMNS]),
+                    fmt="%.4f",
+                    delimiter=", ",
+                    header=", ".join(POWER_DATA_COLUMNS),
+                    comments="",
+                )
+        getLogger().info(f"Uploading power file {filename}")
+        urls[suffix] = output_file_uploader.upload_file(filename)
+        getLogger().info(f"Uploaded power url {urls[suffix]}")
+        os.unlink(filename)
+    return power_data, urls
+
+
+def _getOutputSuffixes(output_format):
+    assert output_format in POWER_OUTPUT_FORMATS, (
+        f"Unknown power data output format {output_format}, "
+        f"expected one of {', '.join(POWER_OUTPUT_FORMATS)}"
+    )
+    return POWER_OUTPUT_FORMATS[output_format]
 
 
 def _getMonsoonSerialno(device_hash, monsoon_map=None, Monsoon=None):
@@ -14,36 +14,26 @@ def get_benchmark_start_end(data, window_size) -> tuple[int, int]:
     assert len(data) >= window_size, "Not enough data to find benchmark start/end"
     assert window_size % 2 == 0, "window size should be even"
     half_window_size = int(window_size / 2)
-    conv_output = []
     # first half of the window is filled with -1 and second half with 1
     #                 ,____________+1
     #                 |
     #                 |
     # -1______________|
-    # Convolution with the above kernel can be computed as below.
-    conv_out = np.sum(data[half_window_size:window_size]) - np.sum(
-        data[:half_window_size]
+    # Convolution with the above kernel at offset i is
+    # sum(data[i+half:i+window]) - sum(data[i:i+half]), which with the
+    # prefix sums p of the data is p[i+window] - 2 * p[i+half] + p[i].
+    # This computes all len(data) - window + 1 outputs in O(N) numpy ops.
+    prefix = np.concatenate(([0.0], np.cumsum(data, dtype=np.float64)))
+    num_outputs = len(data) - window_size + 1
+    conv_output = (
+        prefix[window_size : window_size + num_outputs]
+        - 2 * prefix[half_window_size : half_window_size + num_outputs]
+        + prefix[:num_outputs]
     )
-    conv_output.append(conv_out)
-    for i in range(0, len(data) - window_size):
-        # No need to recompute convolution for the entire window. We can reuse the
-        # previous output, and adjust at the first, last and middle.
-        # Example: with a window size of 1000
-        # The first output, out_0: sum(data[500:1000])-sum(data[0:500])
-        # The second output: out_1: sum(data[501:1001])-sum(data[1:501])
-        # i.e., out_1 = out_0 + data[0] - 2 * data[500] + data[1000]
-        # This reduces convolution complexity from O(M*N) -> O(M)
-        conv_out = (
-            conv_output[-1]  # previous output (prev)
-            + data[i]  # in prev, this was subtracted. Now add it so that it is removed.
-            # in prev, this was added. Now subtract it twice for the new window.
-            - (2 * data[i + half_window_size])
-            + data[i + window_size]  # new sample: add it
-        )
-        conv_output.append(conv_out)
-    conv_output = np.array(conv_output)
-    start_ind = np.argmax(conv_output) + half_window_size
-    end_ind = np.argmin(conv_output) + half_window_size
+    # the step up into the benchmark is the largest output,
+    # the step down out of it the smallest
+    start_ind = int(np.argmax(conv_output)) + half_window_size
+    end_ind = int(np.argmin(conv_output)) + half_window_size
     return start_ind, end_ind
 
 
@@ -54,7 +44,8 @@ def post_process_power_data(power_data, sample_rate, num_iters):
     # creating an averaging window of 10 seconds to filter out noise,
     # to capture the start/end of benchmark window
     window_size = 10 * sample_rate
-    power = power_data["total_power"]
+    # a contiguous array, the slices and means below do not copy it again
+    power = np.asarray(power_data["total_power"], dtype=np.float64)
     getLogger().info(
         "Post-processing power data to find the start/end of benchmark window"
     )
@@ -81,6 +72,50 @@ def post_process_power_data(power_data, sample_rate, num_iters):
     return data
 
 
+def summarize_power_samples(times, power, running, num_iters):
+    """
+    Integrate periodic power samples in mW over time. The benchmark window
+    spans the samples in which the benchmark program was seen running,
+    all samples if it never was.
+    """
+    running_ind = np.flatnonzero(running)
+    if len(running_ind) > 0:
+        start_ind, end_ind = running_ind[0], running_ind[-1] + 1
+    else:
+        getLogger().warning(
+            "The benchmark program was not seen running while sampling power, "
+            "using all samples as the benchmark window."
+        )
+        start_ind, end_ind = 0, len(power)
+    window_times = times[start_ind:end_ind]
+    window_power = power[start_ind:end_ind]
+    duration = window_times[-1] - window_times[0]
+    # trapezoidal rule, mW * s = mJ
+    energy = float(
+        np.sum((window_power[1:] + window_power[:-1]) / 2 * np.diff(window_times))
+    )
+    average_power = (
+        energy / duration if duration > 0 else float(np.mean(window_power))
+    )
+    getLogger().info(
+        f"Benchmark ran for {duration:.2f} seconds at {average_power:.1f} mW"
+    )
+    data = {
+        "average_power": _composeStructuredData(average_power, "average_power", "mW"),
+        "energy": _composeStructuredData(energy / 1e3, "energy", "J"),
+    }
+    if num_iters and num_iters > 0:
+        data["energy_per_inference"] = _composeStructuredData(
+            energy / 1e3 / num_iters, "energy_per_inference", "J"
+        )
+    idle_power = np.concatenate((power[:start_ind], power[end_ind:]))
+    if len(idle_power) > 0:
+        data["baseline_power"] = _composeStructuredData(
+            float(np.mean(idle_power)), "baseline_power", "mW"
+        )
+    return data
+
+
 def _composeStructuredData(data, metric, unit):
     return {
         "values": [data],
@@ -1,17 +1,155 @@
 # pyre-unsafe
 
+import os
+import tempfile
 import time
 
+import numpy as np
 from utils.custom_logger import getLogger
+from utils.power_utils import summarize_power_samples
+
+BATTERY_DIR = "/sys/class/power_supply/battery"
+DEFAULT_SAMPLE_RATE = 10
+# The sampler stops by itself this long after the collection should have ended.
+SAMPLER_GRACE_PERIOD = 60
+
+# One line per sample: uptime in seconds, current_now in uA, voltage_now
+# in uV and whether the benchmark program is running. The arguments are
+# the control file, the output file, the battery directory, the program
+# name, the sampling interval and the maximum duration in seconds.
+SAMPLER_SCRIPT = """\
+end=$(( $(cut -d. -f1 /proc/uptime) + $6 ))
+while [ -e "$1" ]; do
+  read up idle < /proc/uptime
+  read current < "$3/current_now"
+  read voltage < "$3/voltage_now"
+  running=0
+  if [ -n "$4" ] && pidof "$4" > /dev/null 2>&1; then
+    running=1
+  fi
+  echo "$up $current $voltage $running"
+  if [ ${up%.*} -ge $end ]; then
+    break
+  fi
+  sleep "$5"
+done > "$2"
+"""
+
+
+class BatterySampler:
+    """
+    Samples the battery current and voltage of an Android device from a
+    loop running on the device, so that sampling continues while the USB
+    connection is cut to stop charging. The samples are pulled afterwards.
+    """
+
+    def __init__(self, platform, duration, sample_rate, program=None):
+        self.platform = platform
+        self.duration = duration
+        self.sample_rate = sample_rate
+        self.program = os.path.basename(program) if program else ""
+        tgt_dir = platform.tgt_dir
+        self.script_file = os.path.join(tgt_dir, "battery_sampler.sh")
+        self.control_file = os.path.join(tgt_dir, "battery_sampler.running")
+        self.output_file = os.path.join(tgt_dir, "battery_samples.txt")
+
+    def start(self):
+        with tempfile.NamedTemporaryFile(
+            mode="w", delete=False, prefix="battery_sampler_", suffix=".sh"
+        ) as f:
+            f.write(SAMPLER_SCRIPT)
+        try:
+            self.platform.util.push(f.name, self.script_file)
+        finally:
+            os.unlink(f.name)
+        self.platform.util.shell(["touch", self.control_file])
+        # detach the loop from the adb session, which ends with the usb cut
+        self.platform.util.shell(
+            [
+                "nohup",
+                "sh",
+                self.script_file,
+                self.control_file,
+                self.output_file,
+                BATTERY_DIR,
+                # an empty program name is passed as ''
+                self.program or "''",
+                str(round(1.0 / self.sample_rate, 4)),
+                str(int(self.duration + SAMPLER_GRACE_PERIOD)),
+                "</dev/null",
+                ">/dev/null",
+                "2>&1",
+                "&",
+            ]
+        )
+
+    def stop(self):
+        """Stop the loop and return the samples as (time, power in mW,
+        running) arrays, or None if no samples were collected."""
+        self.platform.util.shell(["rm", "-f", self.control_file])
+        # let the loop finish its last sample
+        time.sleep(1.0 / self.sample_rate + 0.5)
+        with tempfile.TemporaryDirectory() as tempdir:
+            local_file = os.path.join(tempdir, "battery_samples.txt")
+            self.platform.util.pull(self.output_file, local_file)
+            self.platform.util.shell(
+                ["rm", "-f", self.output_file, self.script_file], silent=True
+            )
+            if not os.path.isfile(local_file):
+                getLogger().error("No battery samples were collected.")
+                return None
+            samples = _parseSamples(local_file)
+        if samples is None:
+            getLogger().error("No battery samples were collected.")
+            return None
+        times, current, voltage, running = samples
+        # current_now and voltage_now are in uA and uV, the sign of the
+        # current while discharging differs across vendors
+        power = np.abs(current) * voltage * 1e-9
+        return times, power, running
+
+
+def _parseSamples(filename):
+    rows = []
+    with open(filename) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) != 4:
+                continue
+            try:
+                rows.append([float(field) for field in fields])
+            except ValueError:
+                continue
+    if not rows:
+        return None
+    samples = np.asarray(rows, dtype=np.float64)
+    return (
+        samples[:, 0],
+        samples[:, 1],
+        samples[:, 2],
+        samples[:, 3].astype(bool),
+    )
 
 
 class PowerUtil:
-    def __init__(self, platform, duration):
+    def __init__(
+        self,
+        platform,
+        duration,
+        program=None,
+        num_iters=None,
+        sample_rate=DEFAULT_SAMPLE_RATE,
+    ):
         self.platform = platform
         self.data = []
         self.duration = duration
+        self.num_iters = num_iters
+        self.sampler = None
+        if sample_rate and platform.getType() == "android":
+            self.sampler = BatterySampler(platform, duration, sample_rate, program)
 
     def collect(self):
+        sampling = self._startSampler()
         self.data.append(self.platform.currentPower())
         self.platform.usb_controller.disconnect(self.platform.platform_hash)
 
@@ -29,8 +167,28 @@ class PowerUtil:
             self.platform.powerInfo["metric"],
             self.platform.powerInfo["unit"],
         )
+        if sampling:
+            try:
+                samples = self.sampler.stop()
+                if samples is not None:
+                    result.update(summarize_power_samples(*samples, self.num_iters))
+            except Exception:
+                getLogger().exception("Could not process the battery samples.")
         return result
 
+    def _startSampler(self):
+        if self.sampler is None:
+            return False
+        try:
+            self.sampler.start()
+            return True
+        except Exception:
+            getLogger().exception(
+                "Could not start the battery sampler, only the charge counter "
+                "is reported."
+            )
+            return False
+
 
 def _composeStructuredData(data, metric, unit):
     # TODO(axit): Fix the structure based on how we want to display battery data
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+# pyre-unsafe
+
+##############################################################################
+# Copyright 2017-present, Facebook, Inc.
+# All rights reserved.
+#
+# This source code is licensed under the license found in the
+# LICENSE file in the root directory of this source tree.
+##############################################################################
+
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+
+class Span:
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self.tid = threading.get_ident()
+        self.start = time.time()
+
+
+class Tracer:
+    """
+    Records nested timing spans of a job and exports them in the
+    Chrome trace event format, viewable in chrome://tracing or Perfetto.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.events = []
+        self.pid = os.getpid()
+        self.start = time.time()
+
+    @contextmanager
+    def span(self, name, **args):
+        span = Span(name, args)
+        try:
+            yield span
+        finally:
+            self._addEvent(span, time.time())
+
+    def _addEvent(self, span, end):
+        event = {
+            "name": span.name,
+            "ph": "X",
+            "ts": round((span.start - self.start) * 1e6),
+            "dur": round((end - span.start) * 1e6),
+            "pid": self.pid,
+            "tid": span.tid,
+            "start": span.start,
+        }
+        if span.args:
+            event["args"] = span.args
+        with self.lock:
+            self.events.append(event)
+
+    def summarize(self, since=None, tid=None):
+        """Total seconds and count per span name, optionally only of the
+        spans started after since on thread tid."""
+        seconds = defaultdict(float)
+        counts = defaultdict(int)
+        with self.lock:
+            events = list(self.events)
+        for event in events:
+            if since is not None and event["start"] < since:
+                continue
+            if tid is not None and event["tid"] != tid:
+                continue
+            seconds[event["name"]] += event["dur"] / 1e6
+            counts[event["name"]] += 1
+        return {
+            name: {"seconds": round(seconds[name], 3), "count": counts[name]}
+            for name in seconds
+        }
+
+    def getTrace(self):
+        with self.lock:
+            events = [
+                {k: v for k, v in event.items() if k != "start"}
+                for event in self.events
+            ]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, filename):
+        with open(filename, "w") as f:
+            json.dump(self.getTrace(), f)
+        return filename
+
+
+# The tracer of the job running in this process. run_lab runs one job per
+# process, the benchmark threads of the job share it.
+_tracer = None
+
+
+def startTrace():
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def getTracer():
+    return _tracer
+
+
+def stopTrace():
+    global _tracer
+    tracer = _tracer
+    _tracer = None
+    return tracer
+
+
+@contextmanager
+def traceSpan(name, **args):
+    """A timing span of the current trace, a no-op if no trace is started."""
+    tracer = _tracer
+    if tracer is None:
+        yield None
+        return
+    with tracer.span(name, **args) as span:
+        yield span
+
+
+def traced(name):
+    """Decorator recording each call of the function as a span."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with traceSpan(name):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def summarizeTrace(since):
+    """The phases of the current trace started on this thread after since."""
+    tracer = _tracer
+    if tracer is None:
+        return {}
+    return tracer.summarize(since, threading.get_ident())
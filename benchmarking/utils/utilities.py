@@ -12,16 +12,21 @@
 
 
 import ast
+import asyncio
 import copy
 import datetime
+import gzip
 import json
 import os
 import socket
 import sys
 import tempfile
+import threading
 import uuid
+import weakref
 import zipfile
 from time import sleep
+from urllib.parse import urlencode
 
 import aiohttp
 import certifi
@@ -207,6 +212,163 @@ def ca_cert():
     return os.environ["CA_CERT_PATH"]
 
 
+# Process-wide HTTP connection pooling. Sessions are created lazily and
+# reused by every request so that keep-alive connections to the job queue
+# and file storage servers are not re-established on each call.
+DEFAULT_HTTP_POOL_CONNECTIONS = 4
+DEFAULT_HTTP_POOL_MAXSIZE = 16
+HTTP_COMPRESS_MIN_BYTES = 1024
+
+http_pool_config = {
+    "pool_connections": DEFAULT_HTTP_POOL_CONNECTIONS,
+    "pool_maxsize": DEFAULT_HTTP_POOL_MAXSIZE,
+    "compress": False,
+}
+http_stats = {
+    "requests": 0,
+    "new_connections": 0,
+    "async_requests": 0,
+    "async_new_connections": 0,
+    "async_reused_connections": 0,
+}
+_http_lock = threading.Lock()
+_http_session = None
+_http_session_pid = None
+_async_http_sessions = weakref.WeakKeyDictionary()
+
+
+def configureHttpPool(pool_connections=None, pool_maxsize=None, compress=None):
+    """Set the pool sizes and default body compression for pooled sessions.
+    Existing sync sessions are dropped so that new settings take effect."""
+    global _http_session
+    with _http_lock:
+        if pool_connections is not None:
+            http_pool_config["pool_connections"] = pool_connections
+        if pool_maxsize is not None:
+            http_pool_config["pool_maxsize"] = pool_maxsize
+        if compress is not None:
+            http_pool_config["compress"] = compress
+        if _http_session is not None:
+            _retireHttpSession(_http_session)
+            _http_session = None
+
+
+def getHttpSession():
+    """Return the process-wide requests session, creating it if needed.
+    A forked child never reuses the sockets of its parent."""
+    global _http_session, _http_session_pid
+    with _http_lock:
+        if _http_session is None or _http_session_pid != os.getpid():
+            """
+            When we use multiprocessing to call harness from internal,
+            requests.Post(url, **kwargs) will get stuck and neither proceeding
+            ahead nor throwing an error. Instead, we use Session and set
+            trust_env to False to solve the problem.
+            Reference: https://stackoverflow.com/a/39822223
+            """
+            session = requests.Session()
+            session.trust_env = False
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=http_pool_config["pool_connections"],
+                pool_maxsize=http_pool_config["pool_maxsize"],
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            if _http_session_pid != os.getpid():
+                # counters of the parent process do not apply to this one
+                for key in http_stats:
+                    http_stats[key] = 0
+            _http_session = session
+            _http_session_pid = os.getpid()
+        return _http_session
+
+
+def _countPoolConnections(session):
+    total = 0
+    adapters = {id(a): a for a in session.adapters.values()}
+    for adapter in adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                total += pool.num_connections
+    return total
+
+
+def _retireHttpSession(session):
+    http_stats["new_connections"] += _countPoolConnections(session)
+    session.close()
+
+
+async def _onAsyncConnectionCreate(session, context, params):
+    http_stats["async_new_connections"] += 1
+
+
+async def _onAsyncConnectionReuse(session, context, params):
+    http_stats["async_reused_connections"] += 1
+
+
+def _getAsyncHttpSession():
+    """Return the aiohttp session bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    session = _async_http_sessions.get(loop)
+    if session is None or session.closed:
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_connection_create_end.append(_onAsyncConnectionCreate)
+        trace_config.on_connection_reuseconn.append(_onAsyncConnectionReuse)
+        connector = aiohttp.TCPConnector(limit=http_pool_config["pool_maxsize"])
+        session = aiohttp.ClientSession(
+            connector=connector, trace_configs=[trace_config]
+        )
+        _async_http_sessions[loop] = session
+    return session
+
+
+async def closeAsyncHttpSession():
+    """Close the aiohttp session of the running event loop, if any.
+    Must be awaited before the loop is closed."""
+    session = _async_http_sessions.pop(asyncio.get_running_loop(), None)
+    if session is not None and not session.closed:
+        await session.close()
+
+
+def getHttpConnectionStats():
+    """Return request and connection counters of the pooled sessions."""
+    with _http_lock:
+        stats = dict(http_stats)
+        if _http_session is not None and _http_session_pid == os.getpid():
+            stats["new_connections"] += _countPoolConnections(_http_session)
+    stats["reused_connections"] = max(stats["requests"] - stats["new_connections"], 0)
+    return stats
+
+
+def _compressRequestBody(kwargs):
+    """Gzip the json or form body of a post request in place.
+    Bodies smaller than HTTP_COMPRESS_MIN_BYTES are sent as is."""
+    if "json" in kwargs:
+        body = json.dumps(kwargs["json"]).encode("utf-8")
+        content_type = "application/json"
+    elif isinstance(kwargs.get("data"), dict):
+        body = urlencode(kwargs["data"], doseq=True).encode("utf-8")
+        content_type = "application/x-www-form-urlencoded"
+    else:
+        return kwargs
+    if len(body) < HTTP_COMPRESS_MIN_BYTES:
+        return kwargs
+    kwargs.pop("json", None)
+    kwargs["data"] = gzip.compress(body)
+    headers = dict(kwargs.get("headers") or {})
+    headers["Content-Type"] = content_type
+    headers["Content-Encoding"] = "gzip"
+    kwargs["headers"] = headers
+    return kwargs
+
+
+def _getRetryDelay(delay):
+    delay = delay + 1 if delay <= 5 else delay
+    return delay, 1 << delay
+
+
 def requestsData(url, **kwargs):
     delay = 0
     total_delay = 0
@@ -214,22 +376,16 @@ def requestsData(url, **kwargs):
     if "timeout" in kwargs:
         timeout = kwargs["timeout"]
     retry = kwargs.pop("retry", True)
+    if kwargs.pop("compress", http_pool_config["compress"]):
+        kwargs = _compressRequestBody(kwargs)
     result = None
     while True:
         try:
-            """
-            When we use multiprocessing to call harness from internal,
-            requests.Post(url, **kwargs) will get stuck and neither proceeding
-            ahead nor throwing an error. Instead, we use Session and set
-            trust_env to False to solve the problem.
-            Reference: https://stackoverflow.com/a/39822223
-            """
-            with requests.Session() as session:
-                session.trust_env = False
-                # This session object can be reused.
-                # If the CA_CERT file has changed it will not be updated implicitly.
-                session.verify = ca_cert()
-                result = session.post(url, **kwargs)
+            session = getHttpSession()
+            # Resolve the CA_CERT file on every request so that a change
+            # is picked up by the shared session.
+            result = session.post(url, verify=ca_cert(), **kwargs)
+            http_stats["requests"] += 1
             if result.status_code != 200:
                 getLogger().error(
                     f"Post request failed, receiving code {result.status_code}"
@@ -248,8 +404,7 @@ def requestsData(url, **kwargs):
             getLogger().exception("Post ChunkedEncodingError")
         if not retry:
             break
-        delay = delay + 1 if delay <= 5 else delay
-        sleep_time = 1 << delay
+        delay, sleep_time = _getRetryDelay(delay)
         getLogger().info(f"wait {sleep_time} seconds. Retrying...")
         sleep(sleep_time)
         total_delay += sleep_time
@@ -262,36 +417,40 @@ def requestsData(url, **kwargs):
 
 
 async def asyncRequestsData(loop, url, **kwargs):
+    """The loop argument is kept for backward compatibility, the session of
+    the running loop is always used."""
     delay = 0
     total_delay = 0
     timeout = -1
     if "timeout" in kwargs:
         timeout = kwargs["timeout"]
     retry = kwargs.pop("retry", True)
+    if kwargs.pop("compress", http_pool_config["compress"]):
+        kwargs = _compressRequestBody(kwargs)
     result = None
     while True:
         try:
-            async with aiohttp.ClientSession(loop=loop) as session:
-                async with session.post(url, **kwargs) as result:
-                    text = await result.text()
-                    if result.status != 200:
-                        text = json.loads(text)
-                        getLogger().error(
-                            f"Async post request returned status code {result.status}. Reason: {result.reason} Message: {text.get('error', {})}"
-                        )
-                    else:
-                        # getLogger().info(result.status)
-                        if delay > 0:
-                            getLogger().info("Async post request successful")
-                        return result
+            session = _getAsyncHttpSession()
+            async with session.post(url, **kwargs) as result:
+                http_stats["async_requests"] += 1
+                text = await result.text()
+                if result.status != 200:
+                    text = json.loads(text)
+                    getLogger().error(
+                        f"Async post request returned status code {result.status}. Reason: {result.reason} Message: {text.get('error', {})}"
+                    )
+                else:
+                    if delay > 0:
+                        getLogger().info("Async post request successful")
+                    return result
         except Exception:
             getLogger().exception("Exception occurred during async request!")
         if not retry:
             break
-        delay = delay + 1 if delay <= 5 else delay
-        sleep_time = 1 << delay
+        delay, sleep_time = _getRetryDelay(delay)
         getLogger().info(f"wait {sleep_time} seconds. Retrying...")
-        sleep(sleep_time)
+        # never block the event loop while backing off
+        await asyncio.sleep(sleep_time)
         total_delay += sleep_time
         if timeout > 0 and total_delay > timeout:
             break